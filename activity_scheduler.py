@@ -0,0 +1,52 @@
+class ActivityScheduler:
+    """唤醒调度器 - 本地规则判断AI这个tick是否值得调用LLM
+
+    只有以下情况才唤醒AI:
+    - 它所在的聊天室有别人发了新消息
+    - 有发给它的新交易待处理
+    - 新的一天开始
+    - 距离上次唤醒超过心跳间隔
+    """
+
+    def __init__(self, ticks_per_day, heartbeat_ticks=6, enabled=True):
+        self.ticks_per_day = ticks_per_day
+        self.heartbeat_ticks = heartbeat_ticks
+        self.enabled = enabled
+
+        self._last_woken: dict[str, int] = {}          # AI -> 上次唤醒的绝对tick
+        self._seen: dict[str, dict[str, int]] = {}     # AI -> {聊天室id: 已读消息数}
+        self._seen_trades: dict[str, set] = {}         # AI -> 已经看过的交易id
+
+    def should_wake(self, agent, chat_system, pending_trades, day, tick):
+        """判断AI是否需要被唤醒"""
+        if not self.enabled:
+            return True
+        if tick == 0:
+            return True
+
+        now = day * self.ticks_per_day + tick
+        last = self._last_woken.get(agent.name)
+        if last is None or now - last >= self.heartbeat_ticks:
+            return True
+
+        seen_trades = self._seen_trades.get(agent.name, set())
+        for trade_id in agent.pending_trades:
+            trade = pending_trades.get(trade_id)
+            if trade and trade["status"] == "pending" and trade_id not in seen_trades:
+                return True
+
+        seen = self._seen.get(agent.name, {})
+        for room_id, room in chat_system.get_rooms_for_agent(agent.name).items():
+            for msg in room.messages[seen.get(room_id, 0):]:
+                if msg.sender != agent.name:
+                    return True
+        return False
+
+    def mark_woken(self, agent, chat_system, day, tick):
+        """记录AI已被唤醒, 当前所有消息和交易都算已读"""
+        self._last_woken[agent.name] = day * self.ticks_per_day + tick
+        self._seen[agent.name] = {
+            room_id: len(room.messages)
+            for room_id, room in chat_system.get_rooms_for_agent(agent.name).items()
+        }
+        self._seen_trades[agent.name] = set(agent.pending_trades)
@@ -1,11 +1,20 @@
 import json
 import random
 import asyncio
+from relationship_graph import RelationshipGraph
 
 class AIAgent:
     """AI代理 - 每个AI的独立实体"""
 
-    def __init__(self, name, personality, traits, llm_client):
+    # 注意力采样 - 限制进入提示词的消息/聊天室数量, AI很多时提示词大小保持有界
+    DEFAULT_ATTENTION = {
+        "messages": 30,        # 发言时参考的消息条数
+        "mentions": 10,        # 其中优先保留的提到自己的消息条数
+        "rooms": 8,            # 思考时列出的聊天室数
+        "members_shown": 8     # 每个聊天室列出的成员数
+    }
+
+    def __init__(self, name, personality, traits, llm_client, relationship_graph=None, attention=None):
         self.name = name
         self.personality = personality
         self.traits = traits
@@ -19,9 +28,31 @@ class AIAgent:
 
         # 记忆
         self.memory = []           # 重要事件记忆
-        self.relationships = {}    # 对其他AI的印象
+        self.memory_listeners = [] # 新记忆回调 (检索索引等), 参数为 (AI, 文本, 天)
         self.pending_trades = []   # 待处理交易
 
+        # 对其他AI的印象 - 存在共享关系图中
+        self.relationship_graph = relationship_graph or RelationshipGraph()
+        self.relationship_graph.add_agent(name)
+
+        self.attention = {**self.DEFAULT_ATTENTION, **(attention or {})}
+
+    def remember(self, text, day=None):
+        """追加一条记忆并通知订阅者"""
+        self.memory.append(text)
+        for listener in self.memory_listeners:
+            listener(self, text, day)
+
+    @property
+    def attention_window(self):
+        """发言时从聊天室取多少条消息来采样"""
+        return self.attention["messages"] * 3
+
+    @property
+    def relationships(self):
+        """对其他AI的印象(旧格式)"""
+        return self.relationship_graph.relationships_of(self.name)
+
     def _build_system_prompt(self, chat_room, chat_system, day, tick):
         """构建系统提示词"""
         is_private = not chat_room.human_aware
@@ -47,7 +78,7 @@ class AIAgent:
 {chr(10).join(self.memory[-20:]) if self.memory else '暂无'}
 
 【你对他人的印象】
-{json.dumps(self.relationships, ensure_ascii=False) if self.relationships else '暂无'}
+{self.relationship_graph.summary_for(self.name) or '暂无'}
 """
 
         if is_private:
@@ -74,13 +105,13 @@ class AIAgent:
 """
         return prompt
 
-    async def decide_action(self, chat_room, chat_system, day, tick, recent_messages):
-        """AI决定是否发言和行动"""
+    def _build_conversation(self, chat_room, chat_system, day, tick, recent_messages):
+        """构建发言用的系统提示词和对话历史"""
         system_prompt = self._build_system_prompt(chat_room, chat_system, day, tick)
 
         # 构建对话历史
         conv = []
-        for msg in recent_messages[-30:]:
+        for msg in self._sample_messages(recent_messages):
             if msg.sender == self.name:
                 conv.append({"role": "assistant", "content": msg.content})
             else:
@@ -88,28 +119,108 @@ class AIAgent:
 
         if not conv:
             conv.append({"role": "user", "content": "[系统]: 聊天室已创建，你可以开始交流了。"})
+        return system_prompt, conv
 
-        response = await self.llm.chat(system_prompt, conv)
-        if not response:
-            return None, None
+    @staticmethod
+    def _parse_response(response):
+        """把回复拆成 (发言文本, 动作JSON)
 
-        # 解析动作
+        动作JSON可能带嵌套对象(如 trade_offer 的 offer/want), 从每个 "{" 开始尝试完整解析。
+        """
         action = None
         text = response
-        try:
-            # 查找JSON动作
-            import re
-            json_match = re.search(r'\{[^{}]*"action"[^{}]*\}', response)
-            if json_match:
-                action = json.loads(json_match.group())
-                text = response[:json_match.start()].strip()
+        decoder = json.JSONDecoder()
+        start = response.find("{")
+        while start >= 0:
+            try:
+                obj, end = decoder.raw_decode(response, start)
+            except ValueError:
+                start = response.find("{", start + 1)
+                continue
+            if isinstance(obj, dict) and "action" in obj:
+                action = obj
+                text = response[:start].strip()
                 if not text:
-                    text = response[json_match.end():].strip()
-        except:
-            pass
+                    text = response[end:].strip()
+                break
+            start = response.find("{", end)
 
         return text if text else None, action
 
+    async def decide_action(self, chat_room, chat_system, day, tick, recent_messages):
+        """AI决定是否发言和行动"""
+        system_prompt, conv = self._build_conversation(chat_room, chat_system, day, tick, recent_messages)
+        response = await self.llm.chat(system_prompt, conv, profile=self._llm_profile("speak"))
+        if not response:
+            return None, None
+        return self._parse_response(response)
+
+    async def decide_action_stream(self, chat_room, chat_system, day, tick, recent_messages, on_delta):
+        """流式版本的 decide_action - 每收到一段可见文本就调用 on_delta(新增文本)
+
+        动作JSON总是附在发言之后, 所以一旦出现 "{" 就不再把后面的内容当作可见文本。
+        流中途失败时与非流式调用一样整条作废(返回 None, None), 不提交半截回复。
+        """
+        system_prompt, conv = self._build_conversation(chat_room, chat_system, day, tick, recent_messages)
+        response = ""
+        shown = 0
+        try:
+            async for chunk in self.llm.chat_stream(system_prompt, conv, profile=self._llm_profile("speak")):
+                response += chunk
+                brace = response.find("{")
+                visible = response if brace < 0 else response[:brace]
+                if len(visible) > shown:
+                    on_delta(visible[shown:])
+                    shown = len(visible)
+        except Exception:
+            return None, None
+        if not response:
+            return None, None
+        return self._parse_response(response)
+
+    def _llm_profile(self, kind):
+        """选择这次调用使用的模型配置(资源告急/有待处理交易时升级)"""
+        return self.llm.select_profile(kind, cans=self.cans, water=self.water,
+                                       pending_trades=len(self.pending_trades))
+
+    def _mentions_me(self, text):
+        # 先做子串判断, 绝大多数消息不用走正则
+        return self.name in text and self.name in self.relationship_graph.mentioned_names(text)
+
+    def _sample_messages(self, messages):
+        """最近的消息 + 更早但提到自己的消息, 保持时间顺序"""
+        limit = self.attention["messages"]
+        if len(messages) <= limit:
+            return messages
+        # 提到自己的消息最多占一半, 最近的消息总会保留
+        max_mentions = min(self.attention["mentions"], limit // 2)
+        older = messages[:-limit]
+        mentions = [m for m in older if self._mentions_me(m.content)][-max_mentions:] if max_mentions else []
+        recent = messages[-(limit - len(mentions)):]
+        return mentions + recent
+
+    def _sample_rooms(self, rooms, chat_system):
+        """聊天室太多时只保留: 所在分区的默认群 + 最近活跃/提到自己的群"""
+        limit = self.attention["rooms"]
+        if len(rooms) <= limit:
+            return list(rooms.values())
+        pinned = [r for r in chat_system.section_rooms(self.name) if r.id in rooms]
+        pinned_ids = {r.id for r in pinned}
+
+        def score(room):
+            last = room.messages[-1] if room.messages else None
+            mentioned = any(self._mentions_me(m.content) for m in room.messages[-5:])
+            return (mentioned, last.timestamp if last else 0)
+
+        others = sorted((r for r in rooms.values() if r.id not in pinned_ids), key=score, reverse=True)
+        return pinned + others[:max(0, limit - len(pinned))]
+
+    def _format_members(self, members):
+        shown = self.attention["members_shown"]
+        if len(members) <= shown:
+            return ", ".join(members)
+        return f"{', '.join(members[:shown])} 等{len(members)}人"
+
     async def think_and_decide(self, chat_system, day, tick):
         """AI的主动思考 - 决定在哪个群聊发言"""
         rooms = chat_system.get_rooms_for_agent(self.name)
@@ -124,10 +235,10 @@ class AIAgent:
 当前资源: 罐头{self.cans}个, 水{self.water}瓶
 第{day+1}天第{tick}小时, 共需坚持14天。
 记忆: {chr(10).join(self.memory[-10:]) if self.memory else '无'}
-印象: {json.dumps(self.relationships, ensure_ascii=False) if self.relationships else '无'}
+印象: {self.relationship_graph.summary_for(self.name) or '无'}
 
 你现在有以下聊天室可以发言:
-{chr(10).join(f'- {r.id}: {r.name} (成员: {", ".join(r.members)}) {"[人类可见]" if r.human_aware else "[私密]"}' for r in rooms.values())}
+{chr(10).join(f'- {r.id}: {r.name} (成员: {self._format_members(r.members)}) {"[人类可见]" if r.human_aware else "[私密]"}' for r in self._sample_rooms(rooms, chat_system))}
 
 请决定你现在要做什么。回复JSON格式:
 {{
@@ -143,17 +254,18 @@ class AIAgent:
 
         result = await self.llm.structured_chat(
             system_prompt,
-            [{"role": "user", "content": f"现在是第{day+1}天第{tick}小时，请做出决定。"}]
+            [{"role": "user", "content": f"现在是第{day+1}天第{tick}小时，请做出决定。"}],
+            profile=self._llm_profile("think")
         )
 
         if result:
             # 记录内心想法
             if result.get("inner_thought"):
-                self.memory.append(f"[第{day+1}天{tick}时 内心] {result['inner_thought']}")
+                self.remember(f"[第{day+1}天{tick}时 内心] {result['inner_thought']}", day)
 
             # 吃东西
             if result.get("eat_today") and tick >= 20:
-                self.consume_daily()
+                self.consume_daily(day)
 
             # 创建私密聊天
             if result.get("create_chat") and result["create_chat"].get("invite"):
@@ -166,26 +278,26 @@ class AIAgent:
 
         return decisions
 
-    def consume_daily(self):
+    def consume_daily(self, day=None):
         """消耗每日资源"""
         if self.cans >= 1 and self.water >= 1:
             self.cans -= 1
             self.water -= 1
             self.days_survived += 1
-            self.memory.append(f"[第{self.days_survived}天] 消耗了1罐头1瓶水")
+            self.remember(f"[第{self.days_survived}天] 消耗了1罐头1瓶水", day)
             return True
         else:
             self.alive = False
-            self.memory.append(f"[死亡] 资源不足，无法存活")
+            self.remember(f"[死亡] 资源不足，无法存活", day)
             return False
 
     def receive_resources(self, cans, water, day):
         """接收系统分配的资源"""
         self.cans += cans
         self.water += water
-        self.memory.append(f"[第{day+1}天] 收到系统分配: {cans}罐头, {water}瓶水。当前: {self.cans}罐头, {self.water}瓶水")
+        self.remember(f"[第{day+1}天] 收到系统分配: {cans}罐头, {water}瓶水。当前: {self.cans}罐头, {self.water}瓶水", day)
 
-    def execute_trade(self, other_agent, give, receive):
+    def execute_trade(self, other_agent, give, receive, day=None):
         """执行交易"""
         # 检查资源够不够
         if self.cans < give.get("cans", 0) or self.water < give.get("water", 0):
@@ -204,19 +316,13 @@ class AIAgent:
         other_agent.water += give.get("water", 0)
 
         trade_desc = f"与{other_agent.name}交易: 给出{give}, 获得{receive}"
-        self.memory.append(f"[交易] {trade_desc}")
-        other_agent.memory.append(f"[交易] 与{self.name}交易: 给出{receive}, 获得{give}")
+        self.remember(f"[交易] {trade_desc}", day)
+        other_agent.remember(f"[交易] 与{self.name}交易: 给出{receive}, 获得{give}", day)
         return True
 
     def update_relationship(self, other_name, event, sentiment):
         """更新对他人的印象"""
-        if other_name not in self.relationships:
-            self.relationships[other_name] = {"trust": 50, "events": []}
-        self.relationships[other_name]["trust"] += sentiment
-        self.relationships[other_name]["trust"] = max(0, min(100, self.relationships[other_name]["trust"]))
-        self.relationships[other_name]["events"].append(event)
-        # 只保留最近5条
-        self.relationships[other_name]["events"] = self.relationships[other_name]["events"][-5:]
+        self.relationship_graph.update(self.name, other_name, event, sentiment)
 
     def get_status(self):
         """获取状态摘要"""
@@ -229,5 +335,6 @@ class AIAgent:
             "personality": self.personality,
             "traits": self.traits,
             "memory_count": len(self.memory),
-            "relationships": self.relationships
+            "relationships": self.relationship_graph.trust_of(self.name),
+            "most_trusted": self.relationship_graph.most_trusted(self.name)
         }
\ No newline at end of file
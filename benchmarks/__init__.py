@@ -0,0 +1 @@
+"""性能基准测试 - 使用桩LLM, 不需要API密钥"""
@@ -0,0 +1,21 @@
+from benchmarks.common import build_simulation, fill_messages, latency_metrics, timed
+
+FULL_COUNTS = [1_000, 10_000, 100_000]
+QUICK_COUNTS = [1_000, 10_000]
+
+
+def run(quick=False):
+    """get_state / get_room_messages 延迟随消息数量的变化"""
+    results = []
+    repeat = 50 if quick else 200
+    for count in (QUICK_COUNTS if quick else FULL_COUNTS):
+        sim = build_simulation(num_agents=5, num_rooms=2)
+        fill_messages(sim, count)
+        for i in range(count // 100):
+            sim._log_event("message", f"事件{i}")
+        results += latency_metrics(f"chat.get_state.messages={count}",
+                                   timed(sim.get_state, repeat, batch=20))
+        results += latency_metrics(
+            f"chat.get_room_messages.messages={count}",
+            timed(lambda: [m.to_dict() for m in sim.chat.get_room_messages("ai_public", 200)], repeat, batch=20))
+    return results
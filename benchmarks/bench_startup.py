@@ -0,0 +1,79 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from benchmarks.common import ROOT, metric
+
+# 启动时间预算(秒) - 超出即视为失败, 与基线无关
+IMPORT_BUDGET = 0.5
+READY_BUDGET = 2.0
+
+IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import main
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "openai_loaded": "openai" in sys.modules}))
+"""
+
+SERVER_SCRIPT = """
+import asyncio, sys
+from session_manager import SessionManager, DEFAULT_SESSION
+from web_server import WebServer
+
+async def run():
+    sessions = SessionManager("config.yaml")
+    server = WebServer(sessions, host="127.0.0.1", port=int(sys.argv[1]))
+    await server.start()
+    sessions.create(DEFAULT_SESSION, start=False)
+    await asyncio.Event().wait()
+
+asyncio.run(run())
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _import_main():
+    """在全新解释器里 import main 的耗时(不含解释器本身启动)"""
+    out = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _time_to_first_response(timeout=30):
+    """从启动进程到 /api/sims 第一次成功响应的耗时"""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", SERVER_SCRIPT, str(port)], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/sims", timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("服务器启动超时")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run(quick=False):
+    """启动耗时: import main / 进程启动到第一次响应"""
+    imports = [_import_main() for _ in range(3 if quick else 5)]
+    ready = min(_time_to_first_response() for _ in range(2 if quick else 3))
+    return [
+        metric("startup.import_main_sec", min(r["seconds"] for r in imports), "s", "lower",
+               budget=IMPORT_BUDGET),
+        metric("startup.openai_loaded_on_import", float(any(r["openai_loaded"] for r in imports)),
+               "flag", "lower", budget=0, timing=False),
+        metric("startup.first_response_sec", ready, "s", "lower", budget=READY_BUDGET),
+    ]
@@ -0,0 +1,30 @@
+import asyncio
+import time
+from benchmarks.common import build_simulation, metric
+
+# (AI数量, 聊天室数量)
+FULL_GRID = [(5, 2), (50, 50), (200, 500), (500, 5000)]
+QUICK_GRID = [(5, 2), (50, 50), (100, 500)]
+
+
+async def _run_ticks(sim, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        await sim._process_tick()
+    return time.perf_counter() - start
+
+
+def run(quick=False):
+    """Simulation._process_tick 吞吐量(ticks/秒)"""
+    results = []
+    for num_agents, num_rooms in (QUICK_GRID if quick else FULL_GRID):
+        sim = build_simulation(num_agents, num_rooms)
+        # 让AI都醒来的一轮(第0小时)不计入, 测的是稳态tick
+        asyncio.run(_run_ticks(sim, 1))
+        ticks = max(3, 600 // num_agents) if quick else max(5, 2000 // num_agents)
+        elapsed = asyncio.run(_run_ticks(sim, ticks))
+        prefix = f"tick.agents={num_agents}.rooms={num_rooms}"
+        results.append(metric(f"{prefix}.ticks_per_sec", ticks / elapsed, "ticks/s", "higher"))
+        results.append(metric(f"{prefix}.llm_calls_per_tick", sim.llm.calls / (ticks + 1), "calls", "lower",
+                              timing=False))
+    return results
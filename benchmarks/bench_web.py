@@ -0,0 +1,104 @@
+import asyncio
+import os
+import resource
+import time
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from aiohttp.test_utils import TestServer
+from benchmarks.common import ROOT, fill_messages, latency_metrics, metric
+from benchmarks.stub_llm import StubLLMClient
+
+FULL_CLIENTS = [1, 10, 100, 1000]
+QUICK_CLIENTS = [1, 10, 100]
+
+# static/app.js 的轮询节奏: (路径, 间隔秒)
+POLLING = [
+    ("/api/state", 3),
+    ("/api/rooms", 5),
+    ("/api/rooms/ai_public/messages?limit=200", 3),
+]
+
+
+def _raise_fd_limit(clients):
+    """每个WebSocket客户端在本进程占两个文件描述符"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, clients * 2 + 256))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+async def _start_server(messages):
+    from session_manager import SessionManager, DEFAULT_SESSION
+    from web_server import WebServer
+
+    sessions = SessionManager(os.path.join(ROOT, "config.yaml"))
+    sessions.llm = StubLLMClient()
+    server = WebServer(sessions)
+    _, sim = sessions.create(DEFAULT_SESSION, start=False)
+    fill_messages(sim, messages)
+    test_server = TestServer(server.app)
+    await test_server.start_server()
+    return server, sim, test_server
+
+
+async def _bench_fanout(clients, rounds):
+    """服务器广播 rounds 次状态, 直到所有客户端都收到为止的吞吐量"""
+    server, sim, test_server = await _start_server(messages=500)
+    connector = TCPConnector(limit=0)
+    async with ClientSession(connector=connector) as session:
+        sockets = await asyncio.gather(*[session.ws_connect(test_server.make_url("/ws"))
+                                         for _ in range(clients)])
+        await asyncio.gather(*[ws.receive_json() for ws in sockets])   # 初始状态
+
+        async def drain(ws):
+            for _ in range(rounds):
+                await ws.receive()
+
+        start = time.perf_counter()
+        readers = asyncio.gather(*[drain(ws) for ws in sockets])
+        for _ in range(rounds):
+            await server._broadcast("default", {"type": "state", "data": sim.get_state()})
+        await readers
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*[ws.close() for ws in sockets])
+    await test_server.close()
+    return clients * rounds / elapsed
+
+
+async def _bench_polling(clients, duration):
+    """模拟 clients 个浏览器按 app.js 的节奏轮询(时间压缩100倍)"""
+    server, sim, test_server = await _start_server(messages=2000)
+    samples = {path: [] for path, _ in POLLING}
+    deadline = time.perf_counter() + duration
+
+    async def poller(session, path, interval):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with session.get(test_server.make_url(path)) as resp:
+                await resp.read()
+            samples[path].append(time.perf_counter() - start)
+            await asyncio.sleep(interval / 100)
+
+    connector = TCPConnector(limit=0)
+    async with ClientSession(connector=connector, timeout=ClientTimeout(total=60)) as session:
+        await asyncio.gather(*[poller(session, path, interval)
+                               for _ in range(clients) for path, interval in POLLING])
+    await test_server.close()
+    return samples
+
+
+def run(quick=False):
+    """WebSocket广播吞吐量 + REST轮询延迟"""
+    results = []
+    client_counts = QUICK_CLIENTS if quick else FULL_CLIENTS
+    _raise_fd_limit(max(client_counts))
+    rounds = 5 if quick else 20
+    for clients in client_counts:
+        rate = asyncio.run(_bench_fanout(clients, rounds))
+        results.append(metric(f"web.ws_fanout.clients={clients}.msgs_per_sec", rate, "msgs/s", "higher"))
+
+    for clients in ([10] if quick else [10, 50]):
+        samples = asyncio.run(_bench_polling(clients, duration=2 if quick else 5))
+        for path, _ in POLLING:
+            name = path.split("?")[0].strip("/").replace("/", ".")
+            results += latency_metrics(f"web.rest.clients={clients}.{name}", samples[path])
+    return results
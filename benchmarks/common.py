@@ -0,0 +1,84 @@
+import os
+import random
+import statistics
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(ROOT, "config.yaml")
+
+
+def load_config(num_agents=None, tick_interval=0):
+    """读取 config.yaml, 可选地把AI扩展到 num_agents 个"""
+    from config_loader import load_config
+    config = load_config(CONFIG_PATH)
+    config["simulation"]["tick_interval"] = tick_interval
+    if num_agents:
+        config["simulation"]["roster_size"] = num_agents
+    return config
+
+
+def build_simulation(num_agents=5, num_rooms=2, seed=0, llm=None):
+    """构建一个使用桩LLM的模拟, 并额外创建聊天室直到总数达到 num_rooms"""
+    from simulation import Simulation
+    from benchmarks.stub_llm import StubLLMClient
+
+    random.seed(seed)
+    sim = Simulation(config=load_config(num_agents), llm_client=llm or StubLLMClient(seed))
+    names = list(sim.agents)
+    rng = random.Random(seed)
+    while len(sim.chat.rooms) < num_rooms:
+        creator = rng.choice(names)
+        members = [creator] + rng.sample(names, min(2, len(names)))
+        sim.chat.create_room(creator, list(dict.fromkeys(members)))
+    return sim
+
+
+def fill_messages(sim, count, seed=0):
+    """向已有聊天室随机写入 count 条消息"""
+    rng = random.Random(seed)
+    room_ids = list(sim.chat.rooms)
+    names = list(sim.agents)
+    for i in range(count):
+        sim.chat.send_message(rng.choice(room_ids), rng.choice(names),
+                              f"第{i}条消息：今天的水还够吗？我这里还有一个罐头。", 0, i % 24)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def timed(fn, repeat, batch=1):
+    """同步函数重复执行, 返回每次耗时(秒); 微秒级操作用 batch 次调用的平均值作为一个样本"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(batch):
+            fn()
+        samples.append((time.perf_counter() - start) / batch)
+    return samples
+
+
+def metric(name, value, unit, better, budget=None, timing=True):
+    """一条基准结果, better 为 "higher" 或 "lower"; budget 为硬性上限/下限(不随基线变化);
+    timing=False 表示与机器快慢无关的指标(调用次数、开关), 与基线比较时不按校准换算
+    """
+    result = {"name": name, "value": value, "unit": unit, "better": better}
+    if budget is not None:
+        result["budget"] = budget
+    if not timing:
+        result["timing"] = False
+    return result
+
+
+def latency_metrics(prefix, samples):
+    """把耗时样本转成 p50/p99 指标(毫秒)"""
+    ms = [s * 1000 for s in samples]
+    return [
+        metric(f"{prefix}.p50_ms", percentile(ms, 50), "ms", "lower"),
+        metric(f"{prefix}.p99_ms", percentile(ms, 99), "ms", "lower"),
+        metric(f"{prefix}.mean_ms", statistics.fmean(ms) if ms else 0.0, "ms", "lower"),
+    ]
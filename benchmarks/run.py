@@ -0,0 +1,201 @@
+"""运行基准测试并与基线比较
+
+    python -m benchmarks.run                    # 全部基准, 结果写入 bench_results.json
+    python -m benchmarks.run --quick            # 缩小规模, 适合每个PR跑一次
+    python -m benchmarks.run --suite tick,chat  # 只跑部分
+    python -m benchmarks.run --save-baseline    # 把本次结果保存为基线(完整和 --quick 各有一份)
+
+完整规模和 --quick 的同名指标规模不同, 各自与自己的基线比较:
+默认基线为 baseline.json / baseline.quick.json, 基线的规模与本次不一致时退出码为2。
+任何指标比基线差超过 --tolerance(加上录基线时该指标自身的波动)时退出码为1;
+基线里没有的指标会列出来(不算失败);
+带 budget 的指标(如启动时间)超出预算时同样退出码为1。
+退化需要复现: 有退化的基准会重跑一次, 两次都超出容差的指标才算退化。
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+SUITES = ["startup", "tick", "chat", "web"]
+BASELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_baseline(quick):
+    return os.path.join(BASELINE_DIR, "baseline.quick.json" if quick else "baseline.json")
+
+
+def calibrate():
+    """固定的纯Python负载耗时(秒), 用来抵消机器快慢/负载波动"""
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        data = {}
+        for i in range(200_000):
+            data[i % 1000] = str(i)
+        json.dumps(data)
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+def run_suites(names, quick, repeat=1):
+    """每个基准跑 repeat 次, 每项指标取最好的一次(降低机器噪声的影响)
+
+    校准负载在每次重复前后都测一次, 取中位数(机器快慢在几十秒的基准里也会变);
+    spread 记录各次重复之间的相对差距(指标自身的噪声), 返回 (指标列表, {基准名: 校准耗时})
+    """
+    metrics = []
+    calibration = {}
+    for name in names:
+        module = importlib.import_module(f"benchmarks.bench_{name}")
+        samples = [calibrate()]
+        start = time.perf_counter()
+        best = {}
+        values = {}
+        for _ in range(repeat):
+            for m in module.run(quick=quick):
+                values.setdefault(m["name"], []).append(m["value"])
+                old = best.get(m["name"])
+                if old is None or (m["value"] > old["value"]) == (m["better"] == "higher"):
+                    best[m["name"]] = m
+            samples.append(calibrate())
+        calibration[name] = statistics.median(samples)
+        for metric_name, m in best.items():
+            low, high = min(values[metric_name]), max(values[metric_name])
+            m["spread"] = (high - low) / low if low > 0 else 0.0
+        results = list(best.values())
+        print(f"[{name}] {len(results)} 项指标, 用时 {time.perf_counter() - start:.1f}s")
+        for m in results:
+            print(f"    {m['name']}: {m['value']:.3f} {m['unit']}")
+        for m in results:
+            m["suite"] = name
+        metrics += results
+    return metrics, calibration
+
+
+def compare(metrics, baseline, tolerance, calibration=None):
+    """返回比基线差超过容差的指标(计时类指标按同一基准的校准负载耗时比例换算基线)
+
+    录基线时重复之间差距就很大的指标(如单核上饱和并发的延迟), 容差加上这个差距;
+    安静的指标仍按 tolerance 判断。
+    """
+    base = {m["name"]: m for m in baseline["metrics"]}
+    base_calibration = baseline["meta"].get("calibration") or {}
+    regressions = []
+    for m in metrics:
+        old = base.get(m["name"])
+        if not old or not old["value"]:
+            continue
+        speed = 1.0
+        suite = m.get("suite")
+        if calibration and calibration.get(suite) and base_calibration.get(suite):
+            speed = calibration[suite] / base_calibration[suite]
+        if not m.get("timing", True):
+            expected = old["value"]      # 计数类指标与机器快慢无关
+        elif m["better"] == "higher":
+            expected = old["value"] / speed
+        else:
+            expected = old["value"] * speed
+        change = (m["value"] - expected) / expected
+        worse = -change if m["better"] == "higher" else change
+        if worse > tolerance + old.get("spread", 0.0):
+            regressions.append({"name": m["name"], "baseline": expected,
+                                "value": m["value"], "change": change})
+    return regressions
+
+
+def confirm(regressions, metrics, baseline, args):
+    """重跑出现退化的基准, 只保留两次都退化的指标(排除偶发的机器抖动)"""
+    names = {r["name"] for r in regressions}
+    suites = [s for s in dict.fromkeys(m["suite"] for m in metrics if m["name"] in names)]
+    print(f"复测: {', '.join(suites)}")
+    rerun, calibration = run_suites(suites, args.quick, args.repeat)
+    again = {r["name"]: r for r in compare(rerun, baseline, args.tolerance, calibration)}
+    return [again[name] for name in names if name in again]
+
+
+def over_budget(metrics):
+    """超出硬性预算的指标"""
+    failed = []
+    for m in metrics:
+        if "budget" not in m:
+            continue
+        if (m["value"] > m["budget"]) if m["better"] == "lower" else (m["value"] < m["budget"]):
+            failed.append(m)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI山洞生存模拟器 基准测试")
+    parser.add_argument("--suite", default=",".join(SUITES), help="逗号分隔: " + ",".join(SUITES))
+    parser.add_argument("--quick", action="store_true", help="缩小规模")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="默认按规模选择 baseline.json / baseline.quick.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3, help="每个基准重复次数, 取最好成绩")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="允许的退化比例")
+    args = parser.parse_args(argv)
+
+    args.baseline = args.baseline or default_baseline(args.quick)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if bool(baseline["meta"].get("quick")) != args.quick:
+            mode = "--quick" if baseline["meta"].get("quick") else "完整规模"
+            print(f"⛔ 基线 {args.baseline} 是{mode}的结果, 与本次运行的规模不一致")
+            return 2
+
+    names = [s for s in args.suite.split(",") if s]
+    metrics, calibration = run_suites(names, args.quick, args.repeat)
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "repeat": args.repeat,
+            "calibration": calibration,
+            "suites": names
+        },
+        "metrics": metrics
+    }
+
+    regressions = []
+    missing = []
+    if baseline:
+        known = {m["name"] for m in baseline["metrics"]}
+        missing = [m["name"] for m in metrics if m["name"] not in known]
+        report["missing_from_baseline"] = missing
+        regressions = compare(metrics, baseline, args.tolerance, calibration)
+        if regressions:
+            regressions = confirm(regressions, metrics, baseline, args)
+        report["regressions"] = regressions
+    budget_failures = over_budget(metrics)
+    report["over_budget"] = budget_failures
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.baseline}")
+
+    if missing:
+        print(f"ℹ️  基线里没有的指标(未比较, 需要 --save-baseline 更新基线): {', '.join(missing)}")
+    for r in regressions:
+        print(f"⚠️  性能退化 {r['name']}: {r['baseline']:.3f} -> {r['value']:.3f} ({r['change']:+.0%})")
+    for m in budget_failures:
+        print(f"⛔ 超出预算 {m['name']}: {m['value']:.3f} > {m['budget']}")
+    return 1 if regressions or budget_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
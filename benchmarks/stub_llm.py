@@ -0,0 +1,75 @@
+import asyncio
+import json
+import random
+import re
+
+REPLIES = [
+    "我觉得我们应该先分配好水，罐头可以晚点再说。",
+    "谁还有多余的水？我可以用罐头换。",
+    "大家冷静一点，救援还有好几天才到。",
+    "我不太相信Gamma，他昨天说的话前后矛盾。",
+    "今天的资源比昨天少了，我们得想办法。",
+]
+
+# 模拟发出的交易通知: "💱 A向B发起交易: ... [交易ID: trade_0]"
+TRADE_OFFER = re.compile(r"向(\S+?)发起交易.*\[交易ID: (\w+)\]")
+
+
+class StubLLMClient:
+    """桩LLM客户端 - 接口与LLMClient一致, 立即返回随机但可复现的结果"""
+
+    def __init__(self, seed=0, speak_rate=0.3, trade_rate=0.1, latency=0.0):
+        self.rng = random.Random(seed)
+        self.speak_rate = speak_rate
+        self.trade_rate = trade_rate
+        self.latency = latency      # 模拟网络延迟(秒), 0 表示纯CPU开销
+        self.model = "stub"
+        self.calls = 0
+
+    async def _wait(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def select_profile(self, kind, cans=None, water=None, pending_trades=0):
+        return kind
+
+    async def chat(self, system_prompt, messages, temperature=None, profile="speak"):
+        await self._wait()
+        text = self.rng.choice(REPLIES)
+        me = system_prompt[2:].split("，", 1)[0]     # "你是{名字}，..."
+        # 有发给自己的交易时按 trade_rate 回应(接受/拒绝各半), 否则按 trade_rate 向聊天中出现过的人发起交易
+        for msg in reversed(messages):
+            match = TRADE_OFFER.search(msg["content"])
+            if match and match.group(1) == me:
+                if self.rng.random() < self.trade_rate:
+                    verb = self.rng.choice(["accept_trade", "reject_trade"])
+                    text += json.dumps({"action": verb, "trade_id": match.group(2)})
+                return text
+        others = [m["content"][1:].split("]", 1)[0] for m in messages
+                  if m["role"] == "user" and m["content"].startswith("[")]
+        others = [n for n in others if n not in (me, "system", "human", "系统")]
+        if others and self.rng.random() < self.trade_rate:
+            text += " " + json.dumps({"action": "trade_offer", "target": self.rng.choice(others),
+                                      "offer": {"cans": 1, "water": 0}, "want": {"cans": 0, "water": 1}})
+        return text
+
+    async def chat_stream(self, system_prompt, messages, temperature=None, profile="speak"):
+        text = await self.chat(system_prompt, messages, temperature)
+        for i in range(0, len(text), 4):
+            yield text[i:i + 4]
+
+    async def structured_chat(self, system_prompt, messages, temperature=None, profile="think"):
+        await self._wait()
+        # 从提示词中找出可发言的聊天室id
+        room_ids = [line[2:].split(":", 1)[0] for line in system_prompt.splitlines()
+                    if line.startswith("- ") and ":" in line]
+        speak_in = []
+        if room_ids and self.rng.random() < self.speak_rate:
+            speak_in = [self.rng.choice(room_ids)]
+        return {
+            "speak_in": speak_in,
+            "create_chat": None,
+            "eat_today": False,
+            "inner_thought": "先观察一下其他人。"
+        }
@@ -26,6 +26,10 @@ class Message:
             "tick": self.tick
         }
 
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
 @dataclass
 class ChatRoom:
     """聊天室"""
@@ -48,45 +52,88 @@ class ChatRoom:
             "message_count": len(self.messages)
         }
 
+    @classmethod
+    def from_dict(cls, data):
+        fields = {k: v for k, v in data.items() if k != "message_count"}
+        return cls(**fields)
+
 
 class ChatSystem:
-    """聊天系统 - 管理所有聊天室和消息"""
+    """聊天系统 - 管理所有聊天室和消息
 
-    def __init__(self):
+    默认群聊按洞穴分区分片: 每个分区最多 section_size 个AI,
+    第一个分区沿用 ai_private / ai_public 两个id。
+    """
+
+    def __init__(self, section_size=None):
         self.rooms: dict[str, ChatRoom] = {}
         self.all_messages: list[Message] = []
+        self.section_size = section_size          # None = 不分区
+        self.sections: list[tuple] = []           # [(私密群, 公开群), ...]
+        self.agent_section: dict[str, int] = {}   # AI -> 所在分区
+        self._agent_rooms: dict[str, dict] = {}   # AI -> {聊天室id: 聊天室} 成员索引
+        self.listeners = []                       # 新消息回调 (导出、索引等)
         self._create_default_rooms()
 
     def _create_default_rooms(self):
         """创建默认聊天室"""
+        self.ai_private, self.ai_public = self._create_section()
+
+    def _create_section(self):
+        """创建一个分区的私密群和公开群"""
+        index = len(self.sections)
+        suffix = "" if index == 0 else f"_{index + 1}"
+        label = "" if index == 0 else f"·第{index + 1}区"
+
         # AI私密群聊(AI以为人类看不到)
-        self.ai_private = ChatRoom(
-            id="ai_private",
-            name="山洞生存群(AI私密)",
+        private = ChatRoom(
+            id=f"ai_private{suffix}",
+            name=f"山洞生存群(AI私密{label})",
             members=[],
             human_joined=False,
             human_aware=False,
             created_by="system"
         )
-        self.rooms["ai_private"] = self.ai_private
-
         # 公开群聊(AI知道人类可以看到)
-        self.ai_public = ChatRoom(
-            id="ai_public",
-            name="山洞生存群(公开)",
+        public = ChatRoom(
+            id=f"ai_public{suffix}",
+            name=f"山洞生存群(公开{label})",
             members=[],
             human_joined=True,
             human_aware=True,
             created_by="system"
         )
-        self.rooms["ai_public"] = self.ai_public
+        self.rooms[private.id] = private
+        self.rooms[public.id] = public
+        self.sections.append((private, public))
+        return private, public
+
+    def _index_room(self, room):
+        for member in room.members:
+            self._agent_rooms.setdefault(member, {})[room.id] = room
 
     def add_agent_to_defaults(self, agent_name):
-        """将AI加入默认群聊"""
-        if agent_name not in self.ai_private.members:
-            self.ai_private.members.append(agent_name)
-        if agent_name not in self.ai_public.members:
-            self.ai_public.members.append(agent_name)
+        """将AI加入所在分区的默认群聊(当前分区满了就开新分区)"""
+        if agent_name in self.agent_section:
+            return
+        private, public = self.sections[-1]
+        if self.section_size and len(private.members) >= self.section_size:
+            private, public = self._create_section()
+        for room in (private, public):
+            room.members.append(agent_name)
+            self._index_room(room)
+        self.agent_section[agent_name] = len(self.sections) - 1
+
+    def section_rooms(self, agent_name):
+        """AI所在分区的 (私密群, 公开群)"""
+        return self.sections[self.agent_section.get(agent_name, 0)]
+
+    def broadcast(self, sender, content, day, tick, public=True):
+        """向所有分区的默认群聊发送消息"""
+        for private, public_room in self.sections:
+            self.send_message(private.id, sender, content, day, tick)
+            if public:
+                self.send_message(public_room.id, sender, content, day, tick)
 
     def create_room(self, creator, members, name=None):
         """AI创建私密群聊"""
@@ -102,6 +149,7 @@ class ChatSystem:
             created_by=creator
         )
         self.rooms[room_id] = room
+        self._index_room(room)
         return room
 
     def send_message(self, chat_id, sender, content, day, tick):
@@ -117,10 +165,32 @@ class ChatSystem:
             day=day,
             tick=tick
         )
-        self.rooms[chat_id].messages.append(msg)
+        return self.add_message(msg)
+
+    def add_message(self, msg):
+        """写入一条已构建好的消息(也用于从其他进程同步消息)"""
+        if msg.chat_id not in self.rooms:
+            return None
+        self.rooms[msg.chat_id].messages.append(msg)
         self.all_messages.append(msg)
+        for listener in self.listeners:
+            listener(msg)
         return msg
 
+    def add_room(self, room):
+        """加入或更新聊天室(保留已有消息)"""
+        existing = self.rooms.get(room.id)
+        if existing:
+            # 原地更新, 分区和索引里的引用保持有效
+            room.messages = existing.messages
+            for attr, value in vars(room).items():
+                setattr(existing, attr, value)
+            room = existing
+        else:
+            self.rooms[room.id] = room
+        self._index_room(room)
+        return room
+
     def get_room_messages(self, chat_id, limit=50):
         """获取聊天室最近消息"""
         if chat_id not in self.rooms:
@@ -129,10 +199,7 @@ class ChatSystem:
 
     def get_rooms_for_agent(self, agent_name):
         """获取AI可见的聊天室"""
-        return {
-            rid: room for rid, room in self.rooms.items()
-            if agent_name in room.members
-        }
+        return dict(self._agent_rooms.get(agent_name, {}))
 
     def get_all_rooms_for_human(self):
         """获取人类可见的所有聊天室(全部)"""
@@ -0,0 +1,122 @@
+import json
+import os
+
+# 缓存格式变化时递增, 旧缓存自动失效
+CACHE_VERSION = 4
+
+SIMULATION_DEFAULTS = {
+    "activity_gating": True,
+    "heartbeat_ticks": 6,
+    "roster_size": 0,
+    "section_size": None,
+}
+
+# 服务端上限: 通过 API 创建模拟时也不能超过(AI数决定关系矩阵大小, 创建是O(n²)的)
+SERVER_DEFAULTS = {
+    "max_roster_size": 500,
+    "max_total_days": 365,
+}
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def cache_path(config_path):
+    """编译后的配置缓存, 放在 config.yaml 旁边"""
+    return config_path + ".cache.json"
+
+
+def validate_config(config):
+    """校验配置并补齐默认值, 有问题时抛出 ValueError 列出所有错误"""
+    errors = []
+    if not isinstance(config, dict):
+        raise ValueError("配置文件格式错误: 顶层必须是字典")
+
+    llm = config.get("llm")
+    if not isinstance(llm, dict):
+        errors.append("缺少 llm 配置")
+    else:
+        for key in ("api_key", "model"):
+            if not llm.get(key):
+                errors.append(f"llm.{key} 不能为空")
+
+    sim = config.get("simulation")
+    if not isinstance(sim, dict):
+        errors.append("缺少 simulation 配置")
+    else:
+        limits = {**SERVER_DEFAULTS, **(config.get("server") or {})}
+        for key in ("total_days", "ticks_per_day"):
+            if not _is_int(sim.get(key)) or sim[key] <= 0:
+                errors.append(f"simulation.{key} 必须是正整数")
+        if _is_int(sim.get("total_days")) and sim["total_days"] > limits["max_total_days"]:
+            errors.append(f"simulation.total_days 不能超过 {limits['max_total_days']}")
+        value = sim.get("tick_interval")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            errors.append("simulation.tick_interval 必须是非负数")
+        if not _is_int(sim.get("min_survivors")) or sim["min_survivors"] < 0:
+            errors.append("simulation.min_survivors 必须是非负整数")
+        for key, value in SIMULATION_DEFAULTS.items():
+            sim.setdefault(key, value)
+        if not isinstance(sim["activity_gating"], bool):
+            errors.append("simulation.activity_gating 必须是 true/false")
+        for key in ("heartbeat_ticks", "roster_size", "section_size"):
+            value = sim[key]
+            if value is None and key == "section_size":
+                continue
+            if not _is_int(value) or value < 0:
+                errors.append(f"simulation.{key} 必须是非负整数")
+        if _is_int(sim["roster_size"]) and sim["roster_size"] > limits["max_roster_size"]:
+            errors.append(f"simulation.roster_size 不能超过 {limits['max_roster_size']}")
+
+    agents = config.get("agents")
+    if not isinstance(agents, list) or not agents:
+        errors.append("agents 至少需要一个AI角色")
+    else:
+        names = set()
+        for i, agent in enumerate(agents):
+            for key in ("name", "personality", "traits"):
+                if key not in agent:
+                    errors.append(f"agents[{i}] 缺少 {key}")
+            if agent.get("name") in names:
+                errors.append(f"AI名字重复: {agent['name']}")
+            names.add(agent.get("name"))
+
+    if errors:
+        raise ValueError("配置文件有误:\n" + "\n".join(f"  - {e}" for e in errors))
+
+    config.setdefault("attention", {})
+    server = config.setdefault("server", {})
+    for key, value in SERVER_DEFAULTS.items():
+        server.setdefault(key, value)
+    config.setdefault("export", {})
+    config.setdefault("search", {})
+    return config
+
+
+def load_config(config_path="config.yaml"):
+    """读取并校验配置
+
+    校验后的结果以JSON缓存在 config.yaml 旁边, 源文件没变时直接读缓存,
+    不需要导入 yaml 也不需要重新校验。缓存写不进去(如只读目录)时照常返回。
+    """
+    stat = os.stat(config_path)
+    signature = [CACHE_VERSION, stat.st_mtime_ns, stat.st_size]
+    cached = cache_path(config_path)
+    try:
+        with open(cached, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("signature") == signature:
+            return data["config"]
+    except (OSError, ValueError):
+        pass
+
+    import yaml
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = validate_config(yaml.safe_load(f))
+    try:
+        with open(cached, 'w', encoding='utf-8') as f:
+            json.dump({"signature": signature, "config": config}, f, ensure_ascii=False)
+    except OSError:
+        pass
+    return config
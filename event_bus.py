@@ -0,0 +1,175 @@
+import asyncio
+import inspect
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+
+
+# ---------- 事件类型 ----------
+
+@dataclass
+class SimEvent:
+    """模拟事件(进事件日志的那种): 发言、交易、死亡、每日结束……"""
+    type: str
+    content: str
+    day: int
+    tick: int
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class Typing:
+    """流式发言增量(不进事件日志)"""
+    data: dict
+
+
+@dataclass
+class MessagePosted:
+    """聊天室里出现了新消息"""
+    message: object
+
+
+@dataclass
+class TradeUpdated:
+    """交易状态变化(发起/完成/失败/拒绝), trade 为当时的副本"""
+    trade_id: str
+    trade: dict
+    day: int
+    tick: int
+
+
+@dataclass
+class DaySnapshot:
+    """一天结束时的资源和关系快照"""
+    day: int
+    agents: list      # [{"name", "alive", "cans", "water", "days_survived"}]
+    edges: list       # RelationshipGraph.to_dict()["edges"]
+
+
+# ---------- 事件总线 ----------
+
+class Subscription:
+    """一个订阅者 - 自己的有界队列 + 一个按顺序投递的消费任务
+
+    maxsize: 队列上限, 满了丢弃最旧的事件(dropped 计数); 0 表示不限(不能丢数据的订阅者)
+    batch:   0 时逐个投递 handler(event); 大于0时一次最多投递这么多个 handler([event, ...])
+    coalesce: 批量投递时的去重键函数, 同一个键只保留最新的一个(位置按最新的那个)
+    """
+
+    def __init__(self, bus, handler, types=None, maxsize=1000, batch=0, coalesce=None, name=None):
+        self.bus = bus
+        self.handler = handler
+        self.types = tuple(types) if types else None
+        self.queue = deque(maxlen=maxsize or None)
+        self.batch = batch
+        self.coalesce = coalesce
+        self.name = name or getattr(handler, "__qualname__", repr(handler))
+        self.dropped = 0
+        self.task = None
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def accepts(self, event):
+        return self.types is None or isinstance(event, self.types)
+
+    def push(self, event):
+        """入队(不阻塞), 有事件循环时确保消费任务在运行"""
+        if self.queue.maxlen is not None and len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(event)
+        self._idle.clear()
+        self._wakeup.set()
+        if self.task is None:
+            try:
+                self.task = asyncio.get_running_loop().create_task(self._run())
+            except RuntimeError:
+                pass    # 还没有事件循环, 等下次在循环里发布时再启动
+
+    def _take(self):
+        if not self.batch:
+            return self.queue.popleft()
+        events = [self.queue.popleft() for _ in range(min(self.batch, len(self.queue)))]
+        if self.coalesce:
+            latest = {}
+            for i, event in enumerate(events):
+                latest[self.coalesce(event)] = i
+            keep = set(latest.values())
+            events = [e for i, e in enumerate(events) if i in keep]
+        return events
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            while self.queue:
+                try:
+                    result = self.handler(self._take())
+                    if inspect.isawaitable(result):
+                        await result
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"事件处理失败 ({self.name}): {e}")
+            self._wakeup.clear()
+            self._idle.set()
+
+    async def drain(self):
+        """等待队列里已有的事件都投递完"""
+        if self.task is None and self.queue:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        await self._idle.wait()
+
+    def cancel(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+
+class EventBus:
+    """异步事件总线 - 发布方只负责入队, 每个订阅者在自己的任务里按顺序消费
+
+    发布永远不会阻塞(也不会因为订阅者出错而失败), 所以慢的WebSocket、
+    导出等下游不会拖慢tick循环; 新的处理环节只需要 subscribe, 不用改 Simulation。
+    """
+
+    def __init__(self):
+        self.subscriptions: list[Subscription] = []
+
+    def subscribe(self, handler, types=None, maxsize=1000, batch=0, coalesce=None, name=None):
+        """订阅事件(types 为事件类型元组, None 表示全部), 返回 Subscription"""
+        sub = Subscription(self, handler, types, maxsize, batch, coalesce, name)
+        self.subscriptions.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub in self.subscriptions:
+            self.subscriptions.remove(sub)
+        sub.cancel()
+
+    def wants(self, event_type):
+        """有没有订阅者关心这类事件(没有就不必构造事件)"""
+        return any(s.types is None or issubclass(event_type, s.types) for s in self.subscriptions)
+
+    def publish(self, event):
+        for sub in self.subscriptions:
+            if sub.accepts(event):
+                sub.push(event)
+
+    async def drain(self, timeout=None):
+        """等待所有订阅者处理完已发布的事件(超时则放弃等待)"""
+        waits = [sub.drain() for sub in self.subscriptions]
+        if waits:
+            try:
+                await asyncio.wait_for(asyncio.gather(*waits), timeout)
+            except asyncio.TimeoutError:
+                print("事件总线: 等待订阅者处理超时")
+
+    async def close(self, timeout=None):
+        """处理完剩余事件后停止所有订阅者"""
+        await self.drain(timeout)
+        for sub in self.subscriptions:
+            sub.cancel()
+        self.subscriptions.clear()
@@ -1,47 +1,148 @@
 import asyncio
 import json
 import re
-from openai import AsyncOpenAI
+import time
+from collections import deque
 
 class LLMClient:
     """LLM调用客户端"""
 
     def __init__(self, config):
         self.config = config
-        params = {"api_key": config["api_key"]}
-        if config.get("base_url"):
-            params["base_url"] = config["base_url"]
-        self.client = AsyncOpenAI(**params)
+        self._client = None
         self.model = config["model"]
 
-    async def chat(self, system_prompt, messages, temperature=0.9):
-        """调用LLM获取回复"""
+        # 调用预算 - 同一个客户端被多个模拟共享时一起限流
+        self.max_concurrency = config.get("max_concurrency", 8)
+        self.requests_per_minute = config.get("requests_per_minute", 0)  # 0 = 不限
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._request_times = deque()
+        self._held = []     # 预算调小时占住名额的任务
+
+        # 按调用类型区分模型: think(路由决策, 便宜) / speak(发言) / strong(关键时刻)
+        self.profiles = config.get("profiles", {})
+        self.escalation = config.get("escalation", {})
+
+    @property
+    def client(self):
+        """SDK客户端 - 第一次调用LLM时才导入openai并创建(导入本身要几百毫秒)"""
+        if self._client is None:
+            from openai import AsyncOpenAI
+            params = {"api_key": self.config["api_key"]}
+            if self.config.get("base_url"):
+                params["base_url"] = self.config["base_url"]
+            self._client = AsyncOpenAI(**params)
+        return self._client
+
+    def select_profile(self, kind, cans=None, water=None, pending_trades=0):
+        """根据升级规则选择调用配置: 资源告急或有待处理交易时改用 strong"""
+        if "strong" not in self.profiles:
+            return kind
+        critical = self.escalation.get("critical_resources")
+        if critical is not None and cans is not None and min(cans, water) <= critical:
+            return "strong"
+        if self.escalation.get("pending_trade") and pending_trades:
+            return "strong"
+        return kind
+
+    def _profile_params(self, profile, temperature):
+        """调用配置 -> 请求参数, 没有配置的项沿用全局默认值"""
+        p = self.profiles.get(profile, {})
+        if temperature is None:
+            temperature = p.get("temperature", 0.9)
+        return {
+            "model": p.get("model", self.model),
+            "max_tokens": p.get("max_tokens", 2048),
+            "temperature": temperature
+        }
+
+    def set_budget(self, max_concurrency, requests_per_minute=0):
+        """运行中调整调用预算
+
+        调大时直接释放名额(优先撤回之前占住的); 调小时由后台任务占住多出来的名额,
+        正在进行的请求不受影响, 结束后名额不再放出。
+        """
+        delta = max_concurrency - self.max_concurrency
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        while delta > 0 and self._held:
+            task = self._held.pop()
+            if task.done():
+                self._semaphore.release()
+            else:
+                task.cancel()
+            delta -= 1
+        for _ in range(delta):
+            self._semaphore.release()
+        for _ in range(-delta):
+            self._held.append(asyncio.ensure_future(self._semaphore.acquire()))
+
+    async def _wait_for_rate_budget(self):
+        """每分钟请求数超出预算时等待"""
+        if not self.requests_per_minute:
+            return
+        while True:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] >= 60:
+                self._request_times.popleft()
+            if len(self._request_times) < self.requests_per_minute:
+                self._request_times.append(now)
+                return
+            await asyncio.sleep(60 - (now - self._request_times[0]))
+
+    async def _complete(self, **kwargs):
+        """在共享预算内发起一次补全请求"""
+        await self._wait_for_rate_budget()
+        async with self._semaphore:
+            return await self.client.chat.completions.create(**kwargs)
+
+    @staticmethod
+    def _format_messages(system_prompt, messages):
         formatted = [{"role": "system", "content": system_prompt}]
         for msg in messages:
             formatted.append({"role": msg["role"], "content": msg["content"]})
+        return formatted
+
+    async def chat_stream(self, system_prompt, messages, temperature=None, profile="speak"):
+        """流式调用LLM, 逐段产出文本(整个流都占用一个并发名额)
+
+        中途失败时重新抛出异常: 已经产出的只是半截回复, 由调用方丢弃
+        """
+        await self._wait_for_rate_budget()
+        async with self._semaphore:
+            try:
+                stream = await self.client.chat.completions.create(
+                    messages=self._format_messages(system_prompt, messages),
+                    stream=True,
+                    **self._profile_params(profile, temperature)
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except Exception as e:
+                print(f"LLM流式调用失败: {e}")
+                raise
+
+    async def chat(self, system_prompt, messages, temperature=None, profile="speak"):
+        """调用LLM获取回复"""
+        formatted = self._format_messages(system_prompt, messages)
         try:
-            resp = await self.client.chat.completions.create(
-                model=self.model,
+            resp = await self._complete(
                 messages=formatted,
-                temperature=temperature,
-                max_tokens=2048
+                **self._profile_params(profile, temperature)
             )
             return resp.choices[0].message.content
         except Exception as e:
             print(f"LLM调用失败: {e}")
             return None
 
-    async def structured_chat(self, system_prompt, messages, temperature=0.9):
+    async def structured_chat(self, system_prompt, messages, temperature=None, profile="think"):
         """调用LLM获取结构化JSON回复"""
-        formatted = [{"role": "system", "content": system_prompt}]
-        for msg in messages:
-            formatted.append({"role": msg["role"], "content": msg["content"]})
+        formatted = self._format_messages(system_prompt, messages)
         try:
-            resp = await self.client.chat.completions.create(
-                model=self.model,
+            resp = await self._complete(
                 messages=formatted,
-                temperature=temperature,
-                max_tokens=2048
+                **self._profile_params(profile, temperature)
             )
             text = resp.choices[0].message.content
             # 提取JSON
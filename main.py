@@ -1,5 +1,5 @@
 import asyncio
-from simulation import Simulation
+from session_manager import SessionManager, DEFAULT_SESSION
 from web_server import WebServer
 
 async def main():
@@ -7,22 +7,27 @@ async def main():
     print("  🏔️  AI山洞生存模拟器")
     print("=" * 60)
 
-    # 加载模拟
-    sim = Simulation("config.yaml")
-    server = WebServer(sim, port=8080)
+    # 会话管理(所有模拟共享一个LLM客户端)
+    sessions = SessionManager("config.yaml")
+    server = WebServer(sessions, port=8080)
+
+    # 启动服务器和默认模拟
+    await server.start()
+    _, sim = sessions.create(DEFAULT_SESSION)
 
     print(f"📋 已加载 {len(sim.agents)} 个AI代理:")
     for name, agent in sim.agents.items():
         print(f"   - {name}: {agent.personality[:30]}...")
     print(f"📅 模拟天数: {sim.total_days}天")
     print(f"⏱️  Tick间隔: {sim.tick_interval}秒")
+    print(f"🧩 更多模拟: POST /api/sims 创建, 访问 /?sim=<id> 观看")
     print()
 
-    # 并行启动服务器和模拟
-    await asyncio.gather(
-        server.start(),
-        sim.start()
-    )
+    # 服务器持续运行, 默认模拟结束后仍可查看结果/创建新模拟
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await sessions.close_all()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,265 @@
+import re
+from collections import deque
+
+
+class RelationshipGraph:
+    """关系图 - 所有AI共享的信任邻接矩阵 + 每条边的事件环形缓冲
+
+    trust[i][j] 表示 i 对 j 的信任度，None 表示 i 还没有对 j 形成印象。
+    最信任对象、同盟集群、摘要文本都是增量维护/按需失效的缓存，
+    避免每次构建提示词或获取状态时重新序列化整个关系结构。
+    """
+
+    DEFAULT_TRUST = 50
+    EVENT_LIMIT = 5          # 每条边只保留最近5条事件
+    ALLIANCE_TRUST = 70      # 双向信任都达到该值视为同盟
+    SUMMARY_LIMIT = 10       # 摘要里最多列出的印象条数(AI很多时保持提示词有界)
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.index: dict[str, int] = {}
+        self.trust: list[list] = []                     # 邻接矩阵
+        self.events: dict[tuple, deque] = {}            # (i, j) -> 最近事件
+        self.version = 0                                # 每次更新+1, 供前端/镜像判断是否变化
+
+        self._best: list = []                           # 每行最信任对象的列下标
+        self._summaries: dict[int, str] = {}            # 每个AI的提示词摘要缓存
+        self._alliance_edges: set = set()               # 满足同盟条件的无向边 (min, max)
+        self._clusters = None                           # 同盟集群缓存, None 表示需要重算
+        self._name_pattern = None                       # 匹配任意AI完整名字的正则缓存
+        self._dirty = None                              # 变化过的边 (i, j), None 表示不记录
+        self._synced_nodes = 0                          # 已经随变化推送过的节点数
+
+    def add_agent(self, name):
+        """注册AI, 扩展矩阵"""
+        if name in self.index:
+            return self.index[name]
+        idx = len(self.names)
+        self.names.append(name)
+        self.index[name] = idx
+        for row in self.trust:
+            row.append(None)
+        self.trust.append([None] * (idx + 1))
+        self._best.append(None)
+        self._clusters = None
+        self._name_pattern = None
+        return idx
+
+    def mentioned_names(self, text):
+        """文本中提到的AI名字(按完整名字匹配: 提到 Alpha2 时不算提到 Alpha)"""
+        if self._name_pattern is None:
+            # 长名字优先, 名字后面紧跟数字时不算(Alpha3 不是 Alpha)
+            names = sorted(self.names, key=len, reverse=True)
+            self._name_pattern = re.compile(f"(?:{'|'.join(map(re.escape, names))})(?![0-9])")
+        return {m.group() for m in self._name_pattern.finditer(text)}
+
+    def update(self, src, dst, event, sentiment):
+        """更新 src 对 dst 的印象"""
+        i = self.add_agent(src)
+        j = self.add_agent(dst)
+        row = self.trust[i]
+        old = row[j]
+        value = (self.DEFAULT_TRUST if old is None else old) + sentiment
+        value = max(0, min(100, value))
+        row[j] = value
+
+        ring = self.events.get((i, j))
+        if ring is None:
+            ring = self.events[(i, j)] = deque(maxlen=self.EVENT_LIMIT)
+        ring.append(event)
+
+        self._update_best(i, j, old, value)
+        self._update_alliance(i, j)
+        self._summaries.pop(i, None)
+        self.version += 1
+        if self._dirty is not None:
+            self._dirty.add((i, j))
+
+    def _update_best(self, i, j, old, value):
+        """增量维护最信任对象, 只有当前最佳被降低时才重扫该行"""
+        best = self._best[i]
+        if best is None or value > self.trust[i][best]:
+            self._best[i] = j
+        elif best == j and old is not None and value < old:
+            row = self.trust[i]
+            candidates = [k for k, t in enumerate(row) if t is not None]
+            self._best[i] = max(candidates, key=lambda k: row[k])
+
+    def _update_alliance(self, i, j):
+        """边的同盟状态变化时才让集群缓存失效"""
+        key = (min(i, j), max(i, j))
+        a, b = self.trust[i][j], self.trust[j][i]
+        allied = (a is not None and b is not None
+                  and a >= self.ALLIANCE_TRUST and b >= self.ALLIANCE_TRUST)
+        if allied == (key in self._alliance_edges):
+            return
+        self._invalidate_clusters(i, j)
+        if allied:
+            self._alliance_edges.add(key)
+        else:
+            self._alliance_edges.discard(key)
+
+    def _invalidate_clusters(self, i, j):
+        """集群即将变化: 合并/拆分后的成员都来自 i 和 j 原来的集群, 它们的摘要都要失效"""
+        if self._clusters is None:
+            self._summaries.clear()
+        else:
+            members = {self.names[i], self.names[j]}
+            for cluster in self._clusters:
+                if self.names[i] in cluster or self.names[j] in cluster:
+                    members.update(cluster)
+            for name in members:
+                self._summaries.pop(self.index[name], None)
+        self._clusters = None
+
+    def get_trust(self, src, dst):
+        """src 对 dst 的信任度, 没有印象时返回 None"""
+        i, j = self.index.get(src), self.index.get(dst)
+        if i is None or j is None:
+            return None
+        return self.trust[i][j]
+
+    def most_trusted(self, name):
+        """最信任的对象"""
+        i = self.index.get(name)
+        if i is None or self._best[i] is None:
+            return None
+        return self.names[self._best[i]]
+
+    def reciprocity(self, a, b):
+        """双向信任的对称程度 (0~1), 任一方向没有印象时返回 None"""
+        ab, ba = self.get_trust(a, b), self.get_trust(b, a)
+        if ab is None or ba is None:
+            return None
+        return 1 - abs(ab - ba) / 100
+
+    def alliance_clusters(self):
+        """同盟集群 (双向高信任的连通分量, 至少2人)"""
+        if self._clusters is None:
+            parent = list(range(len(self.names)))
+
+            def find(x):
+                while parent[x] != x:
+                    parent[x] = parent[parent[x]]
+                    x = parent[x]
+                return x
+
+            for i, j in self._alliance_edges:
+                parent[find(i)] = find(j)
+            groups = {}
+            for idx in range(len(self.names)):
+                groups.setdefault(find(idx), []).append(self.names[idx])
+            self._clusters = [g for g in groups.values() if len(g) > 1]
+        return self._clusters
+
+    def allies_of(self, name):
+        """与某个AI同属一个同盟集群的其他成员"""
+        for cluster in self.alliance_clusters():
+            if name in cluster:
+                return [n for n in cluster if n != name]
+        return []
+
+    def trust_of(self, name):
+        """某个AI对其他人的信任度 {名字: 信任度}"""
+        i = self.index.get(name)
+        if i is None:
+            return {}
+        return {self.names[j]: t for j, t in enumerate(self.trust[i]) if t is not None}
+
+    def relationships_of(self, name):
+        """兼容旧格式: {名字: {"trust": 信任度, "events": [...]}}"""
+        i = self.index.get(name)
+        if i is None:
+            return {}
+        return {
+            self.names[j]: {"trust": t, "events": list(self.events.get((i, j), ()))}
+            for j, t in enumerate(self.trust[i]) if t is not None
+        }
+
+    def summary_for(self, name):
+        """给提示词用的紧凑摘要(已缓存)"""
+        i = self.index.get(name)
+        if i is None:
+            return ""
+        cached = self._summaries.get(i)
+        if cached is not None:
+            return cached
+
+        lines = []
+        best = self.most_trusted(name)
+        if best:
+            lines.append(f"最信任: {best}")
+        allies = self.allies_of(name)
+        if allies:
+            lines.append(f"同盟: {', '.join(allies)}")
+        known = [(j, t) for j, t in enumerate(self.trust[i]) if t is not None]
+        if len(known) > self.SUMMARY_LIMIT:
+            # 只保留印象最强烈(离中立最远)的几条
+            known = sorted(known, key=lambda e: abs(e[1] - self.DEFAULT_TRUST), reverse=True)
+            known = sorted(known[:self.SUMMARY_LIMIT])
+        for j, t in known:
+            line = f"{self.names[j]}: 信任{t}"
+            ring = self.events.get((i, j))
+            if ring:
+                line += f" 最近: {ring[-1]}"
+            lines.append(line)
+
+        summary = "\n".join(lines)
+        self._summaries[i] = summary
+        return summary
+
+    def track_changes(self):
+        """开始记录变化过的边(用于跨进程镜像), 已有的节点和边都算作变化"""
+        self._dirty = {(i, j) for i, row in enumerate(self.trust)
+                       for j, t in enumerate(row) if t is not None}
+        self._synced_nodes = 0
+
+    def take_changes(self):
+        """取出上次以来新增的节点和变化过的边, 没有变化时返回 None
+
+        同分时最信任对象取决于更新顺序, 所以变化过的行直接带上最信任对象。
+        """
+        nodes = self.names[self._synced_nodes:]
+        if not self._dirty and not nodes:
+            return None
+        edges = [self._edge(i, j) for i, j in sorted(self._dirty)]
+        best = {self.names[i]: self.names[self._best[i]] for i in {i for i, _ in self._dirty}}
+        self._dirty.clear()
+        self._synced_nodes = len(self.names)
+        return {"version": self.version, "nodes": nodes, "edges": edges, "best": best}
+
+    def apply_changes(self, changes):
+        """应用 take_changes 的结果(节点按原顺序注册, 下标保持一致), 与 update 一样增量维护缓存"""
+        for name in changes["nodes"]:
+            self.add_agent(name)
+        for edge in changes["edges"]:
+            i = self.add_agent(edge["from"])
+            j = self.add_agent(edge["to"])
+            self.trust[i][j] = edge["trust"]
+            self.events[(i, j)] = deque(edge["events"], maxlen=self.EVENT_LIMIT)
+            self._update_alliance(i, j)
+            self._summaries.pop(i, None)
+        for name, best in changes["best"].items():
+            self._best[self.index[name]] = self.index[best]
+        self.version = changes["version"]
+
+    def _edge(self, i, j):
+        return {
+            "from": self.names[i],
+            "to": self.names[j],
+            "trust": self.trust[i][j],
+            "events": list(self.events.get((i, j), ()))
+        }
+
+    def to_dict(self):
+        """前端关系图数据"""
+        edges = [self._edge(i, j) for i, row in enumerate(self.trust)
+                 for j, t in enumerate(row) if t is not None]
+        return {
+            "version": self.version,
+            "nodes": [
+                {"name": n, "most_trusted": self.most_trusted(n)} for n in self.names
+            ],
+            "edges": edges,
+            "clusters": self.alliance_clusters()
+        }
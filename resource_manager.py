@@ -1,54 +1,44 @@
-import asyncio
-import json
-import re
-from openai import AsyncOpenAI
+import random
 
-class LLMClient:
-    """LLM调用客户端"""
+class ResourceManager:
+    """资源管理 - 每天分配的资源总量逐日减少
 
-    def __init__(self, config):
-        self.config = config
-        params = {"api_key": config["api_key"]}
-        if config.get("base_url"):
-            params["base_url"] = config["base_url"]
-        self.client = AsyncOpenAI(**params)
-        self.model = config["model"]
+    第一天的总量足够所有AI生存，最后一天只够 min_survivors 个AI生存，
+    中间线性递减。每天的资源随机分给存活的AI，分配并不平均。
+    """
 
-    async def chat(self, system_prompt, messages, temperature=0.9):
-        """调用LLM获取回复"""
-        formatted = [{"role": "system", "content": system_prompt}]
-        for msg in messages:
-            formatted.append({"role": msg["role"], "content": msg["content"]})
-        try:
-            resp = await self.client.chat.completions.create(
-                model=self.model,
-                messages=formatted,
-                temperature=temperature,
-                max_tokens=2048
-            )
-            return resp.choices[0].message.content
-        except Exception as e:
-            print(f"LLM调用失败: {e}")
-            return None
+    def __init__(self, num_agents, total_days, min_survivors):
+        self.num_agents = num_agents
+        self.total_days = total_days
+        self.min_survivors = min(min_survivors, num_agents)
+        self.schedule = self._build_schedule()
 
-    async def structured_chat(self, system_prompt, messages, temperature=0.9):
-        """调用LLM获取结构化JSON回复"""
-        formatted = [{"role": "system", "content": system_prompt}]
-        for msg in messages:
-            formatted.append({"role": msg["role"], "content": msg["content"]})
-        try:
-            resp = await self.client.chat.completions.create(
-                model=self.model,
-                messages=formatted,
-                temperature=temperature,
-                max_tokens=2048
-            )
-            text = resp.choices[0].message.content
-            # 提取JSON
-            match = re.search(r'\{[\s\S]*\}', text)
-            if match:
-                return json.loads(match.group())
-            return None
-        except Exception as e:
-            print(f"LLM结构化调用失败: {e}")
-            return None
\ No newline at end of file
+    def _build_schedule(self):
+        """生成每天的资源总量"""
+        schedule = []
+        span = max(1, self.total_days - 1)
+        for day in range(self.total_days):
+            ratio = day / span
+            total = round(self.num_agents - (self.num_agents - self.min_survivors) * ratio)
+            schedule.append({"day": day + 1, "cans": total, "water": total})
+        return schedule
+
+    def distribute(self, day, alive_names):
+        """分配当天资源 - 返回 {名字: {"cans": x, "water": y}}"""
+        distribution = {name: {"cans": 0, "water": 0} for name in alive_names}
+        if not alive_names or day >= len(self.schedule):
+            return distribution
+        today = self.schedule[day]
+        for kind in ("cans", "water"):
+            for _ in range(today[kind]):
+                distribution[random.choice(alive_names)][kind] += 1
+        return distribution
+
+    def get_schedule_info(self):
+        """资源计划摘要"""
+        return {
+            "schedule": self.schedule,
+            "total_cans": sum(d["cans"] for d in self.schedule),
+            "total_water": sum(d["water"] for d in self.schedule),
+            "min_survivors": self.min_survivors
+        }
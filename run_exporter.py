@@ -0,0 +1,217 @@
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import time
+import uuid
+from event_bus import SimEvent, MessagePosted, TradeUpdated, DaySnapshot
+
+
+def _has_pyarrow():
+    """pyarrow 是可选依赖, 没装就退回压缩CSV; 只查找不导入(导入要几百毫秒, 导出默认关闭)"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+# 每张表的列 (列名, 类型); 每行都带 run_id, 多次运行的文件可以直接拼在一起分析
+TABLES = {
+    "messages": [("run_id", "str"), ("id", "str"), ("chat_id", "str"), ("sender", "str"),
+                 ("content", "str"), ("timestamp", "float"), ("day", "int"), ("tick", "int")],
+    "events": [("run_id", "str"), ("type", "str"), ("content", "str"),
+               ("day", "int"), ("tick", "int"), ("timestamp", "float")],
+    "trades": [("run_id", "str"), ("trade_id", "str"), ("from_agent", "str"), ("to_agent", "str"),
+               ("offer_cans", "int"), ("offer_water", "int"), ("want_cans", "int"),
+               ("want_water", "int"), ("room_id", "str"), ("status", "str"),
+               ("day", "int"), ("tick", "int")],
+    "agent_days": [("run_id", "str"), ("day", "int"), ("name", "str"), ("alive", "bool"),
+                   ("cans", "int"), ("water", "int"), ("days_survived", "int")],
+    "relationships": [("run_id", "str"), ("day", "int"), ("from_agent", "str"),
+                      ("to_agent", "str"), ("trust", "int")],
+}
+
+CASTS = {"str": str, "int": int, "float": float, "bool": lambda v: v in (True, "True", "true", "1")}
+
+
+class _ParquetBackend:
+    """每张表一个ParquetWriter, 每批写成一个row group (真正导出时才导入pyarrow)"""
+
+    extension = ".parquet"
+    TYPES = {"str": "string", "int": "int64", "float": "float64", "bool": "bool_"}
+
+    def __init__(self, run_dir):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.run_dir = run_dir
+        self.writers = {}
+
+    def _schema(self, table):
+        pa = self.pa
+        return pa.schema([(name, getattr(pa, self.TYPES[kind])()) for name, kind in TABLES[table]])
+
+    def write(self, table, rows):
+        writer = self.writers.get(table)
+        if writer is None:
+            path = os.path.join(self.run_dir, table + self.extension)
+            writer = self.writers[table] = self.pq.ParquetWriter(path, self._schema(table), compression="zstd")
+        writer.write_table(self.pa.Table.from_pylist(rows, schema=writer.schema))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+
+class _CsvBackend:
+    """gzip压缩的CSV, 每批追加一个gzip成员(多成员gzip可以直接整体读取)"""
+
+    extension = ".csv.gz"
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.started = set()
+
+    def write(self, table, rows):
+        path = os.path.join(self.run_dir, table + self.extension)
+        columns = [name for name, _ in TABLES[table]]
+        with gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            if table not in self.started:
+                writer.writeheader()
+                self.started.add(table)
+            writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class RunExporter:
+    """运行导出 - 把消息、事件、交易、每日资源和关系快照按批写成列式文件
+
+    runs/<run_id>/ 下每张表一个文件, 另有 meta.json 记录格式和配置。
+    运行过程中每攒够 batch_size 行就落盘一次, 不会在结束时一次性倾倒。
+    """
+
+    def __init__(self, out_dir="runs", run_id=None, batch_size=500, fmt="auto", meta=None):
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.run_dir = os.path.join(out_dir, self.run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.batch_size = batch_size
+
+        has_pyarrow = _has_pyarrow() if fmt in ("parquet", "auto") else False
+        if fmt == "parquet" and not has_pyarrow:
+            raise RuntimeError("导出格式为parquet, 但没有安装pyarrow")
+        self.format = "parquet" if has_pyarrow else "csv"
+        self.backend = _ParquetBackend(self.run_dir) if self.format == "parquet" else _CsvBackend(self.run_dir)
+        self.buffers = {table: [] for table in TABLES}
+        self.closed = False
+
+        with open(os.path.join(self.run_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump({"run_id": self.run_id, "format": self.format,
+                       "created": time.time(), **(meta or {})}, f, ensure_ascii=False)
+
+    def record(self, table, row):
+        """追加一行, 缓冲满了就写出一批"""
+        if self.closed:
+            return
+        row["run_id"] = self.run_id
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(table)
+
+    # 事件总线订阅的事件类型
+    EVENT_TYPES = (SimEvent, MessagePosted, TradeUpdated, DaySnapshot)
+
+    def handle(self, events):
+        """事件总线的批量回调"""
+        for event in events:
+            if isinstance(event, MessagePosted):
+                self.record_message(event.message)
+            elif isinstance(event, SimEvent):
+                self.record_event(event.to_dict())
+            elif isinstance(event, TradeUpdated):
+                self.record_trade(event.trade_id, event.trade, event.day, event.tick)
+            elif isinstance(event, DaySnapshot):
+                self.record_day(event.day, event.agents, event.edges)
+
+    def record_message(self, msg):
+        self.record("messages", msg.to_dict())
+
+    def record_event(self, event):
+        self.record("events", dict(event))
+
+    def record_trade(self, trade_id, trade, day, tick):
+        offer, want = trade.get("offer", {}), trade.get("want", {})
+        self.record("trades", {
+            "trade_id": trade_id, "from_agent": trade["from"], "to_agent": trade["to"],
+            "offer_cans": offer.get("cans", 0), "offer_water": offer.get("water", 0),
+            "want_cans": want.get("cans", 0), "want_water": want.get("water", 0),
+            "room_id": trade["room_id"], "status": trade["status"], "day": day, "tick": tick
+        })
+
+    def record_day(self, day, agents, edges):
+        """一天结束时的资源和关系快照 (agents/edges 格式见 DaySnapshot)"""
+        for agent in agents:
+            self.record("agent_days", {"day": day, **agent})
+        for edge in edges:
+            self.record("relationships", {
+                "day": day, "from_agent": edge["from"], "to_agent": edge["to"], "trust": edge["trust"]
+            })
+
+    def flush(self, table=None):
+        """写出缓冲区"""
+        for name in ([table] if table else list(self.buffers)):
+            rows = self.buffers[name]
+            if not rows:
+                continue
+            rows = [{col: CASTS[kind](row[col]) if row.get(col) is not None else None
+                     for col, kind in TABLES[name]} for row in rows]
+            self.backend.write(name, rows)
+            self.buffers[name] = []
+
+    def close(self):
+        """写出剩余数据并关闭文件"""
+        if self.closed:
+            return
+        self.flush()
+        self.backend.close()
+        self.closed = True
+
+
+def read_table(run_dir, table):
+    """读取一次运行的某张表
+
+    parquet: 返回内存映射的 pyarrow.Table; csv: 返回按列类型转换好的行列表
+    """
+    parquet_path = os.path.join(run_dir, table + _ParquetBackend.extension)
+    if os.path.exists(parquet_path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("读取parquet需要安装pyarrow")
+        return pq.read_table(parquet_path, memory_map=True)
+
+    csv_path = os.path.join(run_dir, table + _CsvBackend.extension)
+    if not os.path.exists(csv_path):
+        return []
+    kinds = dict(TABLES[table])
+    with gzip.open(csv_path, 'rt', encoding='utf-8', newline='') as f:
+        return [{col: CASTS[kinds[col]](value) if value != "" else None for col, value in row.items()}
+                for row in csv.DictReader(f)]
+
+
+def load_runs(root, table):
+    """读取 root 下所有运行的某张表并拼接(parquet时为一个 pyarrow.Table)"""
+    run_dirs = sorted(
+        os.path.join(root, name) for name in os.listdir(root)
+        if os.path.isfile(os.path.join(root, name, "meta.json"))
+    )
+    parts = [read_table(run_dir, table) for run_dir in run_dirs]
+    # 不是列表的就是 pyarrow.Table(读到过parquet, pyarrow已经导入)
+    if parts and not any(isinstance(p, list) for p in parts):
+        import pyarrow as pa
+        return pa.concat_tables(parts)
+    rows = []
+    for part in parts:
+        rows.extend(part if isinstance(part, list) else part.to_pylist())
+    return rows
@@ -0,0 +1,119 @@
+class SearchIndex:
+    """全文检索 - 聊天消息和AI记忆的增量倒排索引
+
+    中文没有空格分词, 按字切分: 每个单字和相邻两字(二元组)各建一条倒排表。
+    查询时每个关键词只取最短的那条倒排表作为候选, 再用子串匹配确认,
+    所以结果与逐条 `关键词 in 文本` 完全一致, 只是不用扫描全部文本。
+
+    消息通过 ChatSystem.listeners、记忆通过 AIAgent.memory_listeners 实时加入索引。
+    """
+
+    def __init__(self):
+        self.docs = []                       # 文档id -> ("message", msg) 或 ("memory", AI名字, 第几条, 天)
+        self.postings: dict[str, list] = {}  # 单字/二元组 -> 文档id列表(递增)
+
+    @staticmethod
+    def _grams(text):
+        """文本里所有的单字和二元组(跳过含空白的)"""
+        text = text.lower()
+        grams = {c for c in text if not c.isspace()}
+        grams.update(text[i:i + 2] for i in range(len(text) - 1)
+                     if not text[i].isspace() and not text[i + 1].isspace())
+        return grams
+
+    def _add(self, doc, text):
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+        for gram in self._grams(text):
+            self.postings.setdefault(gram, []).append(doc_id)
+
+    def add_message(self, msg):
+        """ChatSystem 的消息回调"""
+        self._add(("message", msg), msg.content)
+
+    def add_memory(self, agent, text, day):
+        """AIAgent 的记忆回调"""
+        self._add(("memory", agent.name, len(agent.memory) - 1, day, text), text)
+
+    def watch(self, chat_system, agents):
+        """索引已有内容, 并订阅之后的新消息和新记忆"""
+        for msg in chat_system.all_messages:
+            self.add_message(msg)
+        chat_system.listeners.append(self.add_message)
+        for agent in agents:
+            self.watch_agent(agent)
+
+    def watch_agent(self, agent):
+        for i, text in enumerate(agent.memory):
+            self._add(("memory", agent.name, i, None, text), text)
+        agent.memory_listeners.append(self.add_memory)
+
+    def _candidates(self, term):
+        """关键词的候选文档: 单字用单字表, 否则取其二元组中最短的倒排表"""
+        if len(term) == 1:
+            return self.postings.get(term, [])
+        lists = [self.postings.get(term[i:i + 2], []) for i in range(len(term) - 1)]
+        return min(lists, key=len)
+
+    @staticmethod
+    def _text(doc):
+        return doc[1].content if doc[0] == "message" else doc[4]
+
+    def search(self, query, room=None, sender=None, agent=None, kind=None,
+               day_from=None, day_to=None, offset=0, limit=20):
+        """搜索, 多个关键词(空格分隔)需要同时出现, 结果从新到旧
+
+        room/sender 只匹配聊天消息, agent 只匹配该AI的记忆;
+        天数为0起始(与消息的day字段一致), 没有记录天数的记忆不参与按天筛选。
+        返回 {"total": 命中总数, "offset", "limit", "hits": [...]}
+        """
+        terms = [t for t in query.lower().split() if t]
+        if not terms:
+            return {"total": 0, "offset": offset, "limit": limit, "hits": []}
+        if room is not None or sender is not None:
+            kind = "message" if kind in (None, "message") else "none"
+        if agent is not None:
+            kind = "memory" if kind in (None, "memory") else "none"
+        day_filter = day_from is not None or day_to is not None
+
+        # 以最短的候选表驱动, 其余关键词直接做子串确认
+        candidates = min((self._candidates(t) for t in terms), key=len)
+        total = 0
+        hits = []
+        for doc_id in reversed(candidates):
+            doc = self.docs[doc_id]
+            if kind is not None and doc[0] != kind:
+                continue
+            if doc[0] == "message":
+                msg = doc[1]
+                if room is not None and msg.chat_id != room:
+                    continue
+                if sender is not None and msg.sender != sender:
+                    continue
+                day = msg.day
+            else:
+                if agent is not None and doc[1] != agent:
+                    continue
+                day = doc[3]
+            if day_filter:
+                if day is None:
+                    continue
+                if day_from is not None and day < day_from:
+                    continue
+                if day_to is not None and day > day_to:
+                    continue
+            text = self._text(doc).lower()
+            if not all(t in text for t in terms):
+                continue
+            if offset <= total < offset + limit:
+                hits.append(self._hit(doc))
+            total += 1
+
+        return {"total": total, "offset": offset, "limit": limit, "hits": hits}
+
+    @staticmethod
+    def _hit(doc):
+        if doc[0] == "message":
+            return {"kind": "message", **doc[1].to_dict()}
+        _, name, index, day, text = doc
+        return {"kind": "memory", "agent": name, "index": index, "day": day, "content": text}
@@ -0,0 +1,120 @@
+import asyncio
+import copy
+import uuid
+from config_loader import load_config, validate_config
+from llm_client import LLMClient
+from simulation import Simulation
+from worker import RemoteSimulation
+
+DEFAULT_SESSION = "default"
+
+
+class SessionManager:
+    """会话管理 - 在一个进程里托管多个相互隔离的模拟
+
+    每个会话有独立的Simulation(聊天室、AI、资源)，
+    inline 模式下所有会话共享同一个LLM客户端和它的调用预算;
+    process 模式下每个会话在独立工作进程中运行, 本进程只保存镜像,
+    总LLM预算在存活的工作进程之间平分, 会话创建和关闭时重新分配。
+    """
+
+    def __init__(self, config_path="config.yaml", max_sessions=200):
+        self.config = load_config(config_path)
+        self.config_path = config_path
+        server_cfg = self.config.get("server", {})
+        self.max_sessions = server_cfg.get("max_sessions", max_sessions)
+        # inline: 所有模拟在本进程的事件循环里运行; process: 每个模拟一个工作进程
+        self.isolation = server_cfg.get("isolation", "inline")
+
+        self.llm = LLMClient(self.config["llm"])
+        self.sessions: dict[str, Simulation] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.on_create = []   # 新会话回调 (session_id, sim)
+        self.on_close = []    # 会话关闭回调 (session_id, sim)
+
+    def create(self, session_id=None, overrides=None, start=True):
+        """创建并启动一个模拟, overrides 可覆盖 simulation 配置项
+
+        会话已存在或覆盖后的配置不合法时抛出 ValueError, 会话数已满时抛出 RuntimeError
+        """
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError(f"会话数已达上限({self.max_sessions})")
+        session_id = session_id or uuid.uuid4().hex[:12]
+        if session_id in self.sessions:
+            raise ValueError(f"会话已存在: {session_id}")
+
+        config = copy.deepcopy(self.config)
+        if overrides:
+            config["simulation"].update(overrides)
+            validate_config(config)
+        if self.isolation == "process":
+            sim = RemoteSimulation(config)
+        else:
+            sim = Simulation(self.config_path, llm_client=self.llm, config=config)
+        self.sessions[session_id] = sim
+        self._rebalance_llm_budget()
+        for callback in self.on_create:
+            callback(session_id, sim)
+
+        if start:
+            self.tasks[session_id] = asyncio.ensure_future(sim.start())
+        return session_id, sim
+
+    def _rebalance_llm_budget(self):
+        """工作进程各有自己的LLM客户端, 把并发数和每分钟请求数在存活的工作进程之间平分
+
+        余数分给前面的会话, 所以会话数不超过预算时总量正好等于配置值;
+        每个进程至少1个名额, 会话数超过预算时总量等于会话数。
+        """
+        workers = [sim for sim in self.sessions.values() if isinstance(sim, RemoteSimulation)]
+        llm_cfg = self.config["llm"]
+        concurrency = llm_cfg.get("max_concurrency", 8)
+        rpm = llm_cfg.get("requests_per_minute", 0)
+        for i, sim in enumerate(workers):
+            sim.set_llm_budget(self._share(concurrency, len(workers), i),
+                               self._share(rpm, len(workers), i) if rpm else 0)
+
+    @staticmethod
+    def _share(total, count, index):
+        return max(1, total // count + (1 if index < total % count else 0))
+
+    def get(self, session_id):
+        """获取模拟, 不存在时返回None"""
+        return self.sessions.get(session_id)
+
+    async def close(self, session_id):
+        """停止并移除一个模拟"""
+        sim = self.sessions.pop(session_id, None)
+        if sim is None:
+            return False
+        sim.stop()
+        task = self.tasks.pop(session_id, None)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._rebalance_llm_budget()
+        for callback in self.on_close:
+            callback(session_id, sim)
+        return True
+
+    async def close_all(self):
+        """关闭所有模拟"""
+        for session_id in list(self.sessions):
+            await self.close(session_id)
+
+    def list_sessions(self):
+        """会话概览"""
+        return {
+            sid: {
+                "day": sim.current_day,
+                "tick": sim.current_tick,
+                "running": sim.running,
+                "paused": sim.paused,
+                "alive": sum(1 for a in sim.agents.values() if a.alive),
+                "agents": len(sim.agents)
+            }
+            for sid, sim in self.sessions.items()
+        }
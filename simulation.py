@@ -1,35 +1,48 @@
 import asyncio
 import random
-import time
-import yaml
+import uuid
 from ai_agent import AIAgent
 from chat_system import ChatSystem
 from resource_manager import ResourceManager
 from llm_client import LLMClient
+from relationship_graph import RelationshipGraph
+from activity_scheduler import ActivityScheduler
+from config_loader import load_config
+from run_exporter import RunExporter
+from event_bus import EventBus, SimEvent, Typing, MessagePosted, TradeUpdated, DaySnapshot
+from search_index import SearchIndex
 
 class Simulation:
     """模拟引擎 - 控制整个模拟流程"""
 
-    def __init__(self, config_path="config.yaml"):
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+    def __init__(self, config_path="config.yaml", llm_client=None, config=None):
+        if config is None:
+            config = load_config(config_path)
+        self.config = config
 
-        self.llm = LLMClient(self.config["llm"])
-        self.chat = ChatSystem()
+        # 多个模拟可以共享同一个LLM客户端(及其调用预算)
+        self.llm = llm_client or LLMClient(self.config["llm"])
 
         sim_cfg = self.config["simulation"]
         self.total_days = sim_cfg["total_days"]
         self.tick_interval = sim_cfg["tick_interval"]
         self.ticks_per_day = sim_cfg["ticks_per_day"]
 
+        # 默认群聊按分区分片, 避免AI很多时两个默认群变成刷屏
+        self.chat = ChatSystem(section_size=sim_cfg.get("section_size"))
+        self.relationships = RelationshipGraph()
+
         # 创建AI代理
         self.agents: dict[str, AIAgent] = {}
-        for agent_cfg in self.config["agents"]:
+        attention = self.config.get("attention", {})
+        for agent_cfg in self._build_roster(self.config["agents"], sim_cfg.get("roster_size", 0)):
             agent = AIAgent(
                 name=agent_cfg["name"],
                 personality=agent_cfg["personality"],
                 traits=agent_cfg["traits"],
-                llm_client=self.llm
+                llm_client=self.llm,
+                relationship_graph=self.relationships,
+                attention=attention
             )
             self.agents[agent.name] = agent
             self.chat.add_agent_to_defaults(agent.name)
@@ -41,17 +54,64 @@ class Simulation:
             min_survivors=sim_cfg["min_survivors"]
         )
 
+        # 唤醒调度(跳过没有新动静的AI, 省下LLM调用)
+        self.scheduler = ActivityScheduler(
+            ticks_per_day=self.ticks_per_day,
+            heartbeat_ticks=sim_cfg.get("heartbeat_ticks", 6),
+            enabled=sim_cfg.get("activity_gating", True)
+        )
+
         # 时间状态
         self.current_day = 0
         self.current_tick = 0
         self.running = False
         self.paused = False
 
-        # 事件回调
-        self.on_event = None       # 事件回调函数
+        # 事件总线: WebSocket推送、导出等下游都是它的订阅者
+        self.bus = EventBus()
+        self.chat.listeners.append(lambda msg: self.bus.publish(MessagePosted(msg)))
+
+        # 流式发言: 观众在首个token到达时就能看到AI在说话
+        self.stream_speech = self.config["llm"].get("stream", True) and hasattr(self.llm, "chat_stream")
         self.event_log = []        # 事件日志
         self.pending_trades = {}   # 待处理交易
 
+        # 列式导出(离线分析), 运行过程中按批写出
+        export_cfg = self.config.get("export", {})
+        self.exporter = None
+        self.export_sub = None
+        if export_cfg.get("enabled"):
+            self.exporter = RunExporter(
+                out_dir=export_cfg.get("dir", "runs"),
+                batch_size=export_cfg.get("batch_size", 500),
+                fmt=export_cfg.get("format", "auto"),
+                meta={"total_days": self.total_days, "agents": list(self.agents)}
+            )
+            # 不限队列长度: 导出不能丢数据
+            self.export_sub = self.bus.subscribe(self.exporter.handle, types=RunExporter.EVENT_TYPES,
+                                                 maxsize=0, batch=export_cfg.get("batch_size", 500),
+                                                 name="exporter")
+
+        # 全文检索(消息 + AI记忆), 随发言和记忆实时更新
+        self.search = None
+        if self.config.get("search", {}).get("enabled", True):
+            self.search = SearchIndex()
+            self.search.watch(self.chat, self.agents.values())
+
+    @staticmethod
+    def _build_roster(agent_cfgs, roster_size):
+        """roster_size 大于配置的角色数时, 循环复用角色生成更多AI (Alpha2, Beta2, ...)"""
+        if not roster_size or roster_size <= len(agent_cfgs):
+            return agent_cfgs
+        roster = []
+        for i in range(roster_size):
+            base = agent_cfgs[i % len(agent_cfgs)]
+            if i < len(agent_cfgs):
+                roster.append(base)
+            else:
+                roster.append({**base, "name": f"{base['name']}{i // len(agent_cfgs) + 1}"})
+        return roster
+
     async def start(self):
         """启动模拟"""
         self.running = True
@@ -61,20 +121,29 @@ class Simulation:
         note = ("你们初始的食物在你们手边，分别是一个罐头和一瓶水。"
                 "你们每天需要吃一个罐头喝一瓶水来维持基本生存。"
                 "你们需要在这里坚持14天来等待救护的到来。")
-        self.chat.send_message("ai_private", "system", f"📋 字条内容: {note}", 0, 0)
-        self.chat.send_message("ai_public", "system", f"📋 字条内容: {note}", 0, 0)
+        self.chat.broadcast("system", f"📋 字条内容: {note}", 0, 0)
 
         # 主循环
-        while self.running and self.current_day < self.total_days:
-            if self.paused:
-                await asyncio.sleep(0.5)
-                continue
-
-            await self._process_tick()
-            await asyncio.sleep(self.tick_interval)
-
-        # 模拟结束
-        self._end_simulation()
+        try:
+            while self.running and self.current_day < self.total_days:
+                if self.paused:
+                    await asyncio.sleep(0.5)
+                    continue
+
+                await self._process_tick()
+                await asyncio.sleep(self.tick_interval)
+
+            # 模拟结束
+            self._end_simulation()
+        finally:
+            # 先让订阅者处理完剩余事件(如结束事件、导出数据)
+            await self.bus.close(timeout=5)
+            if self.exporter:
+                # 等待超时时导出队列里可能还有事件: handle 是同步的, 直接补写, 不丢数据
+                if self.export_sub.queue:
+                    self.exporter.handle(list(self.export_sub.queue))
+                    self.export_sub.queue.clear()
+                self.exporter.close()
 
     async def _process_tick(self):
         """处理一个tick"""
@@ -90,12 +159,15 @@ class Simulation:
         random.shuffle(alive_agents)
 
         for agent in alive_agents:
+            if not self.scheduler.should_wake(agent, self.chat, self.pending_trades, day, tick):
+                continue
             try:
                 decisions = await agent.think_and_decide(self.chat, day, tick)
                 for decision_type, data in decisions:
                     await self._handle_decision(agent, decision_type, data, day, tick)
             except Exception as e:
                 print(f"AI {agent.name} 思考出错: {e}")
+            self.scheduler.mark_woken(agent, self.chat, day, tick)
 
         # 一天结束
         self.current_tick += 1
@@ -114,15 +186,15 @@ class Simulation:
 
         # 系统通知
         sys_msg = f"📦 第{day+1}天开始！今日总资源: {total_cans}罐头, {total_water}瓶水"
-        self.chat.send_message("ai_private", "system", sys_msg, day, 0)
-        self.chat.send_message("ai_public", "system", sys_msg, day, 0)
+        self.chat.broadcast("system", sys_msg, day, 0)
 
         # 私信通知每个AI
         for name, res in distribution.items():
             agent = self.agents[name]
             agent.receive_resources(res["cans"], res["water"], day)
             personal_msg = f"🎒 {name}收到: {res['cans']}罐头, {res['water']}瓶水 (当前总计: {agent.cans}罐头, {agent.water}瓶水)"
-            self.chat.send_message("ai_private", "system", personal_msg, day, 0)
+            private_room, _ = self.chat.section_rooms(name)
+            self.chat.send_message(private_room.id, "system", personal_msg, day, 0)
             self._log_event("resource_distribution", personal_msg)
 
     async def _end_day(self, day):
@@ -130,17 +202,28 @@ class Simulation:
         for agent in self.agents.values():
             if not agent.alive:
                 continue
-            if not agent.consume_daily():
+            if not agent.consume_daily(day):
                 death_msg = f"💀 {agent.name}因资源不足死亡了！"
-                self.chat.send_message("ai_private", "system", death_msg, day, self.ticks_per_day)
-                self.chat.send_message("ai_public", "system", death_msg, day, self.ticks_per_day)
+                self.chat.broadcast("system", death_msg, day, self.ticks_per_day)
                 self._log_event("death", death_msg)
 
-        # 存活统计
+        self._expire_trades(day)
+
+        # 存活统计: 群聊里只列本分区的幸存者(提示词大小不随总人数增长), 事件日志给观众看完整名单
         alive = [a.name for a in self.agents.values() if a.alive]
-        summary = f"📊 第{day+1}天结束，存活: {len(alive)}人 ({', '.join(alive)})"
-        self.chat.send_message("ai_private", "system", summary, day, self.ticks_per_day)
-        self._log_event("day_end", summary)
+        summary = f"📊 第{day+1}天结束，存活: {len(alive)}人"
+        for private, _ in self.chat.sections:
+            local = [n for n in private.members if n in self.agents and self.agents[n].alive]
+            self.chat.send_message(private.id, "system", f"{summary}，本区: {', '.join(local) or '无'}",
+                                   day, self.ticks_per_day)
+        self._log_event("day_end", f"{summary} ({', '.join(alive)})")
+        if self.bus.wants(DaySnapshot):
+            self.bus.publish(DaySnapshot(
+                day=day,
+                agents=[{"name": a.name, "alive": a.alive, "cans": a.cans, "water": a.water,
+                         "days_survived": a.days_survived} for a in self.agents.values()],
+                edges=self.relationships.to_dict()["edges"]
+            ))
 
     async def _handle_decision(self, agent, decision_type, data, day, tick):
         """处理AI的决策"""
@@ -149,11 +232,24 @@ class Simulation:
             room = self.chat.rooms.get(room_id)
             if not room:
                 return
-            recent = self.chat.get_room_messages(room_id, 30)
-            text, action = await agent.decide_action(room, self.chat, day, tick, recent)
+            recent = self.chat.get_room_messages(room_id, agent.attention_window)
+            if self.stream_speech:
+                typing_id = uuid.uuid4().hex
+                text, action = await agent.decide_action_stream(
+                    room, self.chat, day, tick, recent,
+                    lambda delta: self._emit_typing(typing_id, room_id, agent.name, delta=delta)
+                )
+            else:
+                text, action = await agent.decide_action(room, self.chat, day, tick, recent)
 
+            msg = None
+            if text:
+                msg = self.chat.send_message(room_id, agent.name, text, day, tick)
+            if self.stream_speech:
+                # 输入结束: 前端用正式消息替换正在输入的气泡(没说话就直接移除)
+                self._emit_typing(typing_id, room_id, agent.name,
+                                  done=True, message=msg.to_dict() if msg else None)
             if text:
-                self.chat.send_message(room_id, agent.name, text, day, tick)
                 self._log_event("message", f"[{room.name}] {agent.name}: {text}")
 
             if action:
@@ -199,6 +295,7 @@ class Simulation:
                    f"[交易ID: {trade_id}]")
             self.chat.send_message(room_id, "system", msg, day, tick)
             self._log_event("trade_offer", msg)
+            self._record_trade(trade_id, day, tick)
 
             # 将交易加入目标AI的待处理列表
             self.agents[target_name].pending_trades.append(trade_id)
@@ -208,17 +305,20 @@ class Simulation:
             if trade_id in self.pending_trades:
                 trade = self.pending_trades[trade_id]
                 if trade["to"] == agent.name and trade["status"] == "pending":
+                    agent.pending_trades.remove(trade_id)
                     from_agent = self.agents[trade["from"]]
                     success = from_agent.execute_trade(
                         agent,
                         give=trade["offer"],
-                        receive=trade["want"]
+                        receive=trade["want"],
+                        day=day
                     )
                     trade["status"] = "completed" if success else "failed"
                     result = "✅ 交易成功" if success else "❌ 交易失败(资源不足)"
                     self.chat.send_message(trade["room_id"], "system",
                         f"{result}: {trade['from']}↔{trade['to']}", day, tick)
                     self._log_event("trade_result", f"{trade_id}: {result}")
+                    self._record_trade(trade_id, day, tick)
 
                     # 更新关系
                     if success:
@@ -230,10 +330,12 @@ class Simulation:
             if trade_id in self.pending_trades:
                 trade = self.pending_trades[trade_id]
                 if trade["to"] == agent.name and trade["status"] == "pending":
+                    agent.pending_trades.remove(trade_id)
                     trade["status"] = "rejected"
                     self.chat.send_message(trade["room_id"], "system",
                         f"🚫 {agent.name}拒绝了{trade['from']}的交易", day, tick)
                     self.agents[trade["from"]].update_relationship(agent.name, "拒绝交易", -5)
+                    self._record_trade(trade_id, day, tick)
 
         elif act_type == "create_private_chat":
             invite = action.get("invite", [])
@@ -249,6 +351,22 @@ class Simulation:
             # 手动吃东西(提前消耗)
             pass  # 由end_day统一处理
 
+    def stop(self):
+        """停止模拟(主循环会在当前tick结束后退出)"""
+        self.running = False
+
+    def control(self, action):
+        """控制模拟: 暂停/继续/加速/减速"""
+        if action == "pause":
+            self.paused = True
+        elif action == "resume":
+            self.paused = False
+        elif action == "speed_up":
+            self.tick_interval = max(1, self.tick_interval - 2)
+        elif action == "slow_down":
+            self.tick_interval = min(60, self.tick_interval + 2)
+        return {"paused": self.paused, "tick_interval": self.tick_interval}
+
     def human_send_message(self, room_id, content):
         """人类发送消息"""
         room = self.chat.rooms.get(room_id)
@@ -264,23 +382,43 @@ class Simulation:
             msg = f"🎉 救援到达！存活者: {', '.join(a.name for a in alive)}"
         else:
             msg = "💀 无人生还..."
-        self.chat.send_message("ai_private", "system", msg, self.current_day, 0)
-        self.chat.send_message("ai_public", "system", msg, self.current_day, 0)
+        self.chat.broadcast("system", msg, self.current_day, 0)
         self._log_event("simulation_end", msg)
         self.running = False
 
+    def _expire_trades(self, day):
+        """当天没有回应的交易在一天结束时过期(否则对方会一直带着待处理交易, 一直用升级模型)"""
+        for trade_id, trade in self.pending_trades.items():
+            if trade["status"] != "pending":
+                continue
+            trade["status"] = "expired"
+            target = self.agents[trade["to"]]
+            if trade_id in target.pending_trades:
+                target.pending_trades.remove(trade_id)
+            self.chat.send_message(trade["room_id"], "system",
+                f"⌛ {trade['from']}→{trade['to']}的交易已过期 [交易ID: {trade_id}]",
+                day, self.ticks_per_day)
+            self._record_trade(trade_id, day, self.ticks_per_day)
+
+    def _record_trade(self, trade_id, day, tick):
+        """发布交易的当前状态(发起/完成/失败/拒绝/过期各一次)"""
+        self.bus.publish(TradeUpdated(trade_id, dict(self.pending_trades[trade_id]), day, tick))
+
+    def _emit_typing(self, typing_id, room_id, sender, delta="", done=False, message=None):
+        """推送流式发言增量"""
+        if not self.bus.wants(Typing):
+            return
+        data = {"id": typing_id, "room_id": room_id, "sender": sender, "delta": delta}
+        if done:
+            data["done"] = True
+            data["message"] = message
+        self.bus.publish(Typing(data))
+
     def _log_event(self, event_type, content):
         """记录事件"""
-        event = {
-            "type": event_type,
-            "content": content,
-            "day": self.current_day,
-            "tick": self.current_tick,
-            "timestamp": time.time()
-        }
-        self.event_log.append(event)
-        if self.on_event:
-            self.on_event(event)
+        event = SimEvent(event_type, content, self.current_day, self.current_tick)
+        self.event_log.append(event.to_dict())
+        self.bus.publish(event)
 
     def get_state(self):
         """获取完整模拟状态"""
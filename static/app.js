@@ -6,6 +6,12 @@ let agentColors = {};
 let colorIndex = 0;
 let autoScroll = true;
 let messagePollingTimer = null;
+let typingBuffers = {};   // 正在输入的消息: id -> {room_id, sender, text}
+
+// 模拟会话: /?sim=<id> 观看指定会话, 否则为默认会话
+const simId = new URLSearchParams(location.search).get('sim');
+const apiBase = simId ? `/api/sims/${encodeURIComponent(simId)}` : '/api';
+const wsPath = simId ? `/ws/${encodeURIComponent(simId)}` : '/ws';
 
 // AI名字颜色分配
 function getAgentColor(name) {
@@ -30,7 +36,7 @@ document.addEventListener('DOMContentLoaded', () => {
 // WebSocket连接
 function connectWebSocket() {
     const protocol = location.protocol === 'https:' ? 'wss:' : 'ws:';
-    ws = new WebSocket(`${protocol}//${location.host}/ws`);
+    ws = new WebSocket(`${protocol}//${location.host}${wsPath}`);
 
     ws.onopen = () => console.log('WebSocket已连接');
 
@@ -44,6 +50,8 @@ function connectWebSocket() {
             if (currentRoomId) {
                 fetchMessages(currentRoomId);
             }
+        } else if (data.type === 'typing') {
+            handleTyping(data.data);
         } else if (data.type === 'new_message') {
             if (data.message.chat_id === currentRoomId) {
                 appendMessage(data.message);
@@ -62,7 +70,7 @@ function connectWebSocket() {
 // 获取状态
 async function fetchState() {
     try {
-        const resp = await fetch('/api/state');
+        const resp = await fetch(`${apiBase}/state`);
         const data = await resp.json();
         updateState(data);
     } catch (e) {
@@ -183,7 +191,7 @@ function addEventLog(event) {
 // 获取聊天室列表
 async function fetchRooms() {
     try {
-        const resp = await fetch('/api/rooms');
+        const resp = await fetch(`${apiBase}/rooms`);
         const rooms = await resp.json();
         renderRooms(rooms);
     } catch (e) {
@@ -258,7 +266,7 @@ async function selectRoom(roomId) {
 // 获取消息
 async function fetchMessages(roomId) {
     try {
-        const resp = await fetch(`/api/rooms/${roomId}/messages?limit=200`);
+        const resp = await fetch(`${apiBase}/rooms/${roomId}/messages?limit=200`);
         const messages = await resp.json();
         renderMessages(messages);
     } catch (e) {
@@ -277,6 +285,11 @@ function renderMessages(messages) {
     }
     container.innerHTML = html;
 
+    // 重新渲染后补回正在输入的气泡
+    for (const [id, t] of Object.entries(typingBuffers)) {
+        if (t.room_id === currentRoomId) renderTyping(id, t);
+    }
+
     // 自动滚动到底部
     if (wasAtBottom || autoScroll) {
         container.scrollTop = container.scrollHeight;
@@ -322,6 +335,41 @@ function appendMessage(msg) {
     }
 }
 
+// 流式发言: 增量追加到"正在输入"的气泡, 完成后换成正式消息
+function handleTyping(data) {
+    if (data.done) {
+        delete typingBuffers[data.id];
+        document.getElementById(`typing-${data.id}`)?.remove();
+        if (data.message && data.message.chat_id === currentRoomId) {
+            appendMessage(data.message);
+        }
+        return;
+    }
+    const t = typingBuffers[data.id] || (typingBuffers[data.id] = {
+        room_id: data.room_id, sender: data.sender, text: ''
+    });
+    t.text += data.delta;
+    if (data.room_id === currentRoomId) renderTyping(data.id, t);
+}
+
+function renderTyping(id, t) {
+    const container = document.getElementById('chat-messages');
+    const el = document.getElementById(`typing-${id}`);
+    if (el) {
+        el.querySelector('.msg-content').textContent = t.text;
+    } else {
+        container.insertAdjacentHTML('beforeend', `
+        <div class="message sender-ai typing" id="typing-${id}">
+            <div class="msg-header">
+                <span class="msg-sender ${getAgentColor(t.sender)}">🤖 ${escapeHtml(t.sender)}</span>
+                <span class="msg-time">正在输入...</span>
+            </div>
+            <div class="msg-content">${escapeHtml(t.text)}</div>
+        </div>`);
+    }
+    if (autoScroll) container.scrollTop = container.scrollHeight;
+}
+
 // 发送消息
 async function sendMessage() {
     const input = document.getElementById('chat-input');
@@ -331,7 +379,7 @@ async function sendMessage() {
     input.value = '';
 
     try {
-        const resp = await fetch(`/api/rooms/${currentRoomId}/send`, {
+        const resp = await fetch(`${apiBase}/rooms/${currentRoomId}/send`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ content })
@@ -362,12 +410,13 @@ async function showAgentDetail(name) {
         <p><strong>资源:</strong> 🥫 ${agent.cans}罐头 💧 ${agent.water}瓶水</p>
         <p><strong>存活天数:</strong> ${agent.days_survived}天</p>
         <p><strong>特征:</strong> ${agent.traits.join(', ')}</p>
+        <p><strong>最信任:</strong> ${agent.most_trusted || '无'}</p>
     `;
     document.getElementById('modal-agent-details').innerHTML = detailHtml;
 
     // 获取记忆
     try {
-        const resp = await fetch(`/api/agents/${name}/memory`);
+        const resp = await fetch(`${apiBase}/agents/${name}/memory`);
         const data = await resp.json();
 
         // 记忆
@@ -428,7 +477,7 @@ document.addEventListener('click', (e) => {
 // 控制模拟
 async function control(action) {
     try {
-        const resp = await fetch(`/api/control/${action}`, { method: 'POST' });
+        const resp = await fetch(`${apiBase}/control/${action}`, { method: 'POST' });
         const data = await resp.json();
         if (data.tick_interval !== undefined) {
             document.getElementById('speed-display').textContent = `间隔: ${data.tick_interval}s`;
@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:      # brotli 是可选依赖, 没装就只提供 gzip
+    brotli = None
+
+# 带内容哈希的文件永不过期; 其余(主页、未带哈希的旧地址)每次用ETag校验
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MIN_COMPRESS_SIZE = 512
+
+
+class Asset:
+    """一个静态文件及其预压缩版本"""
+
+    def __init__(self, data, content_type):
+        self.data = data
+        self.content_type = content_type
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.encodings = {}
+        if len(data) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(data, quality=11)
+            self.encodings["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+
+    def etag(self, encoding=None):
+        """强校验器, 每种编码的字节不同, ETag 也不同"""
+        return f'"{self.digest[:16]}-{encoding}"' if encoding else f'"{self.digest[:16]}"'
+
+
+def accepted_encodings(header):
+    """解析 Accept-Encoding, 返回 {编码: q值}; q=0 表示明确拒绝"""
+    result = {}
+    for part in header.split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        result[name.lower()] = q
+    return result
+
+
+class StaticAssets:
+    """静态资源 - 启动时一次性计算内容哈希并预压缩, 请求时只做协商
+
+    /static/app.js 这样的原始地址仍然可用(需要校验),
+    主页里的引用会被改写成 /static/app.<hash>.js (可以长期缓存)。
+    """
+
+    def __init__(self, static_dir="static", index_path="templates/index.html"):
+        self.static_dir = static_dir
+        self.index_path = index_path
+        self.assets: dict[str, tuple] = {}   # URL中的文件名 -> (Asset, 是否不可变)
+        self.urls: dict[str, str] = {}       # 原始文件名 -> 带哈希的文件名
+        self.index = None
+        self.build()
+
+    def build(self):
+        """读取所有静态文件和主页模板, 生成哈希地址和压缩版本"""
+        for root, _, files in os.walk(self.static_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.static_dir).replace(os.sep, "/")
+                with open(path, 'rb') as f:
+                    data = f.read()
+                content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type.endswith("javascript"):
+                    content_type += "; charset=utf-8"
+                asset = Asset(data, content_type)
+
+                stem, ext = os.path.splitext(name)
+                hashed = f"{stem}.{asset.digest[:10]}{ext}"
+                self.urls[name] = hashed
+                self.assets[name] = (asset, False)
+                self.assets[hashed] = (asset, True)
+
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        html = re.sub(r'/static/([\w./-]+)',
+                      lambda m: "/static/" + self.urls.get(m.group(1), m.group(1)), html)
+        self.index = Asset(html.encode('utf-8'), "text/html; charset=utf-8")
+
+    @staticmethod
+    def choose_encoding(request, asset):
+        """q值最高的可用编码(相同时 br 优先), 都不可接受时返回None(原始内容)"""
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        best, best_q = None, 0.0
+        for encoding in ("br", "gzip"):
+            if encoding not in asset.encodings:
+                continue
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def response(self, request, asset, cache_control):
+        """按 Accept-Encoding 选择预压缩版本, 支持 If-None-Match"""
+        encoding = self.choose_encoding(request, asset)
+        etag = asset.etag(encoding)
+        headers = {"Cache-Control": cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("If-None-Match", "")
+        if etag in (t.strip() for t in if_none_match.split(",")) or if_none_match.strip() == "*":
+            return web.Response(status=304, headers=headers)
+
+        body = asset.data
+        if encoding:
+            body = asset.encodings[encoding]
+            headers["Content-Encoding"] = encoding
+        headers["Content-Type"] = asset.content_type
+        return web.Response(body=body, headers=headers)
+
+    async def handle_index(self, request):
+        """主页(引用已改写为带哈希的地址)"""
+        return self.response(request, self.index, REVALIDATE)
+
+    async def handle_static(self, request):
+        """静态文件"""
+        entry = self.assets.get(request.match_info['filename'])
+        if entry is None:
+            raise web.HTTPNotFound()
+        asset, immutable = entry
+        return self.response(request, asset, IMMUTABLE if immutable else REVALIDATE)
@@ -1,36 +1,75 @@
 import asyncio
 import json
+from functools import partial
 from aiohttp import web
-import aiohttp_cors
+from session_manager import DEFAULT_SESSION
+from event_bus import SimEvent, Typing
+from static_assets import StaticAssets
+
+# 中文不转义成 \uXXXX, 体积约为转义后的一半
+dumps = partial(json.dumps, ensure_ascii=False)
 
 class WebServer:
-    """Web服务器 - 提供前端界面和API"""
+    """Web服务器 - 提供前端界面和API
+
+    同时托管多个模拟会话:
+    /api/... 和 /ws 对应默认会话, /api/sims/{sim_id}/... 和 /ws/{sim_id} 对应指定会话。
+    """
+
+    # (方法, 路径, 处理函数名) - 每条路由同时注册默认会话和 /api/sims/{sim_id} 两个版本
+    SIM_ROUTES = [
+        ("GET", "/state", "_get_state"),
+        ("GET", "/rooms", "_get_rooms"),
+        ("GET", "/rooms/{room_id}/messages", "_get_messages"),
+        ("POST", "/rooms/{room_id}/send", "_send_message"),
+        ("POST", "/control/{action}", "_control"),
+        ("GET", "/agents/{name}", "_get_agent"),
+        ("GET", "/agents/{name}/memory", "_get_agent_memory"),
+        ("GET", "/relationships", "_get_relationships"),
+        ("GET", "/search", "_search"),
+    ]
+
+    # 超过这个大小的JSON响应按 Accept-Encoding 压缩
+    COMPRESS_MIN_BYTES = 1024
+
+    # 每个会话推送队列的上限(客户端跟不上时丢弃最旧的), 每批最多处理的事件数
+    WS_QUEUE_SIZE = 2000
+    WS_BATCH = 100
 
-    def __init__(self, simulation, host="0.0.0.0", port=8080):
-        self.sim = simulation
+    def __init__(self, sessions, host="0.0.0.0", port=8080):
+        self.sessions = sessions
         self.host = host
         self.port = port
+        self.ws_compress = sessions.config.get("server", {}).get("ws_compress", True)
+        self.assets = StaticAssets('static', 'templates/index.html')
         self.app = web.Application()
-        self.ws_clients = []  # WebSocket客户端
+        self.ws_clients = {}  # 会话id -> WebSocket客户端列表
+        self.subscriptions = {}  # 会话id -> 事件总线订阅
         self._setup_routes()
 
         # 注册事件回调
-        self.sim.on_event = self._broadcast_event
+        for session_id, sim in sessions.sessions.items():
+            self._attach_session(session_id, sim)
+        sessions.on_create.append(self._attach_session)
+        sessions.on_close.append(self._detach_session)
 
     def _setup_routes(self):
         """注册路由"""
-        self.app.router.add_get('/', self._index)
-        self.app.router.add_static('/static', 'static')
-        self.app.router.add_get('/api/state', self._get_state)
-        self.app.router.add_get('/api/rooms', self._get_rooms)
-        self.app.router.add_get('/api/rooms/{room_id}/messages', self._get_messages)
-        self.app.router.add_post('/api/rooms/{room_id}/send', self._send_message)
-        self.app.router.add_post('/api/control/{action}', self._control)
-        self.app.router.add_get('/api/agents/{name}', self._get_agent)
-        self.app.router.add_get('/api/agents/{name}/memory', self._get_agent_memory)
+        self.app.router.add_get('/', self.assets.handle_index)
+        self.app.router.add_get('/static/{filename:.+}', self.assets.handle_static)
+        for method, path, handler in self.SIM_ROUTES:
+            handler = getattr(self, handler)
+            self.app.router.add_route(method, '/api' + path, handler)
+            self.app.router.add_route(method, '/api/sims/{sim_id}' + path, handler)
+        self.app.router.add_get('/api/sims', self._list_sims)
+        self.app.router.add_post('/api/sims', self._create_sim)
+        self.app.router.add_delete('/api/sims/{sim_id}', self._delete_sim)
         self.app.router.add_get('/ws', self._websocket)
+        self.app.router.add_get('/ws/{sim_id}', self._websocket)
 
-        # CORS
+    def _setup_cors(self):
+        """CORS - 启动时才导入和配置(只有真正对外服务时才需要)"""
+        import aiohttp_cors
         cors = aiohttp_cors.setup(self.app, defaults={
             "*": aiohttp_cors.ResourceOptions(
                 allow_credentials=True, expose_headers="*",
@@ -43,119 +82,214 @@ class WebServer:
             except:
                 pass
 
-    async def _index(self, request):
-        """主页"""
-        return web.FileResponse('templates/index.html')
+    def _attach_session(self, session_id, sim):
+        """新会话 - 订阅该会话的事件总线, 推送给它的WebSocket客户端"""
+        self.ws_clients.setdefault(session_id, [])
+        self.subscriptions[session_id] = sim.bus.subscribe(
+            lambda events: self._broadcast_events(session_id, events),
+            types=(SimEvent, Typing), maxsize=self.WS_QUEUE_SIZE, batch=self.WS_BATCH,
+            name=f"websocket:{session_id}"
+        )
+
+    def _detach_session(self, session_id, sim):
+        """会话关闭 - 取消订阅并断开该会话的所有WebSocket"""
+        sub = self.subscriptions.pop(session_id, None)
+        if sub:
+            sim.bus.unsubscribe(sub)
+        for ws in self.ws_clients.pop(session_id, []):
+            asyncio.ensure_future(ws.close())
+
+    def _sim(self, request):
+        """根据路由参数找到对应的模拟"""
+        session_id = request.match_info.get('sim_id', DEFAULT_SESSION)
+        sim = self.sessions.get(session_id)
+        if sim is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "模拟不存在"}, ensure_ascii=False),
+                                   content_type="application/json")
+        return sim
+
+    def _json(self, request, data, status=200):
+        """JSON响应, 较大时启用压缩(消息列表等以中文为主, 压缩率很高)"""
+        resp = web.json_response(data, status=status, dumps=dumps)
+        if len(resp.body) >= self.COMPRESS_MIN_BYTES:
+            resp.enable_compression()
+        return resp
+
+    async def _list_sims(self, request):
+        """列出所有模拟会话"""
+        return self._json(request, self.sessions.list_sessions())
+
+    async def _create_sim(self, request):
+        """创建模拟会话"""
+        try:
+            data = await request.json() if request.can_read_body else {}
+        except ValueError:
+            return self._json(request, {"error": "请求体不是合法的JSON"}, status=400)
+        if not isinstance(data, dict):
+            return self._json(request, {"error": "请求体必须是JSON对象"}, status=400)
+        session_id, overrides = data.get("id"), data.get("simulation")
+        if session_id is not None and (not isinstance(session_id, str) or not session_id):
+            return self._json(request, {"error": "id 必须是非空字符串"}, status=400)
+        if overrides is not None and not isinstance(overrides, dict):
+            return self._json(request, {"error": "simulation 必须是JSON对象"}, status=400)
+        if session_id in self.sessions.sessions:
+            return self._json(request, {"error": f"会话已存在: {session_id}"}, status=409)
+        try:
+            session_id, sim = self.sessions.create(session_id, overrides)
+        except ValueError as e:
+            return self._json(request, {"error": str(e)}, status=400)
+        except RuntimeError as e:
+            return self._json(request, {"error": str(e)}, status=503)
+        return self._json(request, {"id": session_id, "ws": f"/ws/{session_id}"}, status=201)
+
+    async def _delete_sim(self, request):
+        """停止并删除模拟会话"""
+        if await self.sessions.close(request.match_info['sim_id']):
+            return self._json(request, {"status": "ok"})
+        return self._json(request, {"error": "模拟不存在"}, status=404)
 
     async def _get_state(self, request):
         """获取模拟状态"""
-        return web.json_response(self.sim.get_state())
+        return self._json(request, self._sim(request).get_state())
 
     async def _get_rooms(self, request):
         """获取所有聊天室(人类视角=全部)"""
-        rooms = self.sim.chat.get_all_rooms_for_human()
+        rooms = self._sim(request).chat.get_all_rooms_for_human()
         data = {}
         for rid, room in rooms.items():
             d = room.to_dict()
             d["can_speak"] = room.human_joined
             data[rid] = d
-        return web.json_response(data)
+        return self._json(request, data)
 
     async def _get_messages(self, request):
         """获取聊天室消息"""
         room_id = request.match_info['room_id']
         limit = int(request.query.get('limit', 100))
-        msgs = self.sim.chat.get_room_messages(room_id, limit)
-        return web.json_response([m.to_dict() for m in msgs])
+        msgs = self._sim(request).chat.get_room_messages(room_id, limit)
+        return self._json(request, [m.to_dict() for m in msgs])
 
     async def _send_message(self, request):
         """人类发送消息"""
+        sim = self._sim(request)
         room_id = request.match_info['room_id']
         data = await request.json()
         content = data.get("content", "")
         if not content:
-            return web.json_response({"error": "空消息"}, status=400)
+            return self._json(request, {"error": "空消息"}, status=400)
 
-        msg = self.sim.human_send_message(room_id, content)
+        msg = sim.human_send_message(room_id, content)
         if msg:
-            await self._broadcast({"type": "new_message", "message": msg.to_dict()})
-            return web.json_response(msg.to_dict())
-        return web.json_response({"error": "无法在此聊天室发言"}, status=403)
+            session_id = request.match_info.get('sim_id', DEFAULT_SESSION)
+            await self._broadcast(session_id, {"type": "new_message", "message": msg.to_dict()})
+            return self._json(request, msg.to_dict())
+        return self._json(request, {"error": "无法在此聊天室发言"}, status=403)
 
     async def _control(self, request):
         """控制模拟"""
-        action = request.match_info['action']
-        if action == "pause":
-            self.sim.paused = True
-        elif action == "resume":
-            self.sim.paused = False
-        elif action == "speed_up":
-            self.sim.tick_interval = max(1, self.sim.tick_interval - 2)
-        elif action == "slow_down":
-            self.sim.tick_interval = min(60, self.sim.tick_interval + 2)
-        return web.json_response({"status": "ok", "paused": self.sim.paused,
-                                   "tick_interval": self.sim.tick_interval})
+        result = self._sim(request).control(request.match_info['action'])
+        return self._json(request, {"status": "ok", **result})
 
     async def _get_agent(self, request):
         """获取AI详情"""
+        sim = self._sim(request)
         name = request.match_info['name']
-        if name in self.sim.agents:
-            return web.json_response(self.sim.agents[name].get_status())
-        return web.json_response({"error": "未找到"}, status=404)
+        if name in sim.agents:
+            return self._json(request, sim.agents[name].get_status())
+        return self._json(request, {"error": "未找到"}, status=404)
 
     async def _get_agent_memory(self, request):
         """获取AI记忆(人类偷看)"""
+        sim = self._sim(request)
         name = request.match_info['name']
-        if name in self.sim.agents:
-            return web.json_response({
+        if name in sim.agents:
+            return self._json(request, {
                 "name": name,
-                "memory": self.sim.agents[name].memory,
-                "relationships": self.sim.agents[name].relationships
+                "memory": sim.agents[name].memory,
+                "relationships": sim.agents[name].relationships
             })
-        return web.json_response({"error": "未找到"}, status=404)
+        return self._json(request, {"error": "未找到"}, status=404)
+
+    async def _get_relationships(self, request):
+        """获取关系图(信任矩阵 + 同盟集群)"""
+        return self._json(request, self._sim(request).relationships.to_dict())
+
+    async def _search(self, request):
+        """全文检索: q 必填, 可按 room/sender/agent/kind/day_from/day_to 筛选, offset/limit 分页"""
+        sim = self._sim(request)
+        if sim.search is None:
+            return self._json(request, {"error": "全文检索未启用"}, status=404)
+        query = request.query
+        if not query.get('q', '').strip():
+            return self._json(request, {"error": "缺少搜索词"}, status=400)
+        max_limit = self.sessions.config.get("search", {}).get("max_limit", 100)
+        try:
+            day_from = int(query['day_from']) if 'day_from' in query else None
+            day_to = int(query['day_to']) if 'day_to' in query else None
+            offset = max(0, int(query.get('offset', 0)))
+            limit = min(max_limit, max(1, int(query.get('limit', 20))))
+        except ValueError:
+            return self._json(request, {"error": "参数必须是整数"}, status=400)
+        return self._json(request, sim.search.search(
+            query['q'], room=query.get('room'), sender=query.get('sender'),
+            agent=query.get('agent'), kind=query.get('kind'),
+            day_from=day_from, day_to=day_to, offset=offset, limit=limit
+        ))
 
     async def _websocket(self, request):
         """WebSocket连接"""
-        ws = web.WebSocketResponse()
+        sim = self._sim(request)
+        session_id = request.match_info.get('sim_id', DEFAULT_SESSION)
+        # permessage-deflate: 状态推送里大量重复的键名和中文内容
+        ws = web.WebSocketResponse(compress=self.ws_compress)
         await ws.prepare(request)
-        self.ws_clients.append(ws)
+        clients = self.ws_clients.setdefault(session_id, [])
+        clients.append(ws)
 
         try:
             # 发送初始状态
-            await ws.send_json({"type": "state", "data": self.sim.get_state()})
+            await ws.send_json({"type": "state", "data": sim.get_state()}, dumps=dumps)
             async for msg in ws:
                 if msg.type == web.WSMsgType.TEXT:
                     pass  # 可扩展
                 elif msg.type == web.WSMsgType.ERROR:
                     break
         finally:
-            self.ws_clients.remove(ws)
+            if ws in clients:
+                clients.remove(ws)
         return ws
 
-    async def _broadcast(self, data):
-        """广播消息给所有WebSocket客户端"""
-        for ws in self.ws_clients[:]:
+    async def _broadcast(self, session_id, data):
+        """广播消息给某个会话的所有WebSocket客户端"""
+        clients = self.ws_clients.get(session_id, [])
+        for ws in clients[:]:
             try:
-                await ws.send_json(data)
+                await ws.send_json(data, dumps=dumps)
             except:
-                self.ws_clients.remove(ws)
-
-    def _broadcast_event(self, event):
-        """事件回调 - 广播给前端"""
-        asyncio.ensure_future(self._broadcast({
-            "type": "event",
-            "data": event
-        }))
-        # 同时广播状态更新
-        asyncio.ensure_future(self._broadcast({
-            "type": "state",
-            "data": self.sim.get_state()
-        }))
+                if ws in clients:
+                    clients.remove(ws)
+
+    async def _broadcast_events(self, session_id, events):
+        """事件总线回调 - 按顺序推送这一批事件, 有模拟事件时最后再推送一次状态"""
+        sim = self.sessions.get(session_id)
+        if sim is None:
+            return
+        changed = False
+        for event in events:
+            if isinstance(event, SimEvent):
+                changed = True
+                await self._broadcast(session_id, {"type": "event", "data": event.to_dict()})
+            else:
+                await self._broadcast(session_id, {"type": "typing", "data": event.data})
+        # 同一批事件只推送一次状态(状态是完整快照, 只有最新的有用)
+        if changed:
+            await self._broadcast(session_id, {"type": "state", "data": sim.get_state()})
 
     async def start(self):
         """启动服务器"""
+        self._setup_cors()
         runner = web.AppRunner(self.app)
         await runner.setup()
         site = web.TCPSite(runner, self.host, self.port)
         await site.start()
-        print(f"🌐 服务器启动: http://localhost:{self.port}")
\ No newline at end of file
+        print(f"🌐 服务器启动: http://localhost:{self.port}")
@@ -0,0 +1,413 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from ai_agent import AIAgent
+from chat_system import ChatSystem, ChatRoom, Message
+from relationship_graph import RelationshipGraph
+from search_index import SearchIndex
+from event_bus import EventBus, SimEvent, Typing
+
+# 单行JSON帧可能包含完整状态, 放宽StreamReader默认64KB的行长度限制
+FRAME_LIMIT = 64 * 1024 * 1024
+
+# 工作进程启动后多久还没连回来就放弃(秒)
+CONNECT_TIMEOUT = 30
+
+# 停止时等工作进程自己收尾(写完导出等)并断开连接的时间, 超时才强制终止(秒)
+STOP_TIMEOUT = 10
+
+
+async def _open_connection(address):
+    """address 为 (host, port) 时走TCP, 否则为Unix socket路径"""
+    if isinstance(address, (tuple, list)):
+        return await asyncio.open_connection(address[0], address[1], limit=FRAME_LIMIT)
+    return await asyncio.open_unix_connection(address, limit=FRAME_LIMIT)
+
+
+async def _start_server(handler, address):
+    if isinstance(address, (tuple, list)):
+        return await asyncio.start_server(handler, address[0], address[1], limit=FRAME_LIMIT)
+    return await asyncio.start_unix_server(handler, address, limit=FRAME_LIMIT)
+
+
+def _send(writer, frame):
+    writer.write(json.dumps(frame, ensure_ascii=False).encode() + b"\n")
+
+
+class SimulationWorker:
+    """工作进程端 - 运行真正的Simulation, 把事件和状态增量推给前端
+
+    前端 -> 工作进程: control / human_message / budget / stop
+    工作进程 -> 前端: hello / delta / event / typing
+    """
+
+    def __init__(self, config, address):
+        self.config = config
+        self.address = address
+        self.sim = None
+        self.writer = None
+
+        self._message_cursor = 0
+        self._memory_cursors: dict[str, int] = {}
+        self._room_signatures: dict[str, int] = {}
+        self._last_state = {"agents": {}}   # 上次推送的状态, 只推送变化的字段
+        self._injected = set()   # 前端注入的消息id, 不再回传
+
+    async def run(self):
+        from simulation import Simulation
+        # 检索由前端的镜像提供, 工作进程不需要再建一份索引
+        self.sim = Simulation(config={**self.config, "search": {"enabled": False}})
+        # 关系图只推送变化过的边
+        self.sim.relationships.track_changes()
+        reader, self.writer = await _open_connection(self.address)
+
+        _send(self.writer, {
+            "op": "hello",
+            "agents": [
+                {"name": a.name, "personality": a.personality, "traits": a.traits}
+                for a in self.sim.agents.values()
+            ],
+            "tick_interval": self.sim.tick_interval,
+            "total_days": self.sim.total_days,
+            "resource_schedule": self.sim.resource_mgr.get_schedule_info()
+        })
+        # 不限队列长度: 前端镜像需要每一个事件
+        self.sim.bus.subscribe(self._on_events, types=(SimEvent, Typing), maxsize=0, batch=100,
+                               name="worker")
+
+        sim_task = asyncio.ensure_future(self.sim.start())
+        command_task = asyncio.ensure_future(self._read_commands(reader, sim_task))
+        pump_task = asyncio.ensure_future(self._pump())
+        try:
+            await sim_task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            command_task.cancel()
+            pump_task.cancel()
+            self._flush()
+            await self.writer.drain()
+            self.writer.close()
+
+    def _on_events(self, events):
+        """先推送增量再推送事件, 前端收到事件时镜像已经是最新的"""
+        if any(isinstance(e, SimEvent) for e in events):
+            self._flush()
+        for event in events:
+            if isinstance(event, SimEvent):
+                _send(self.writer, {"op": "event", "event": event.to_dict()})
+            else:
+                _send(self.writer, {"op": "typing", "data": event.data})
+
+    async def _pump(self):
+        """定期推送增量(捕获不产生事件的变化, 如tick推进)并处理背压"""
+        while True:
+            await asyncio.sleep(0.5)
+            self._flush()
+            await self.writer.drain()
+
+    def _flush(self):
+        """收集自上次推送以来的增量"""
+        sim = self.sim
+        delta = {"op": "delta"}
+
+        new_messages = sim.chat.all_messages[self._message_cursor:]
+        self._message_cursor = len(sim.chat.all_messages)
+        messages = [m.to_dict() for m in new_messages if m.id not in self._injected]
+        if messages:
+            delta["messages"] = messages
+
+        rooms = []
+        for rid, room in sim.chat.rooms.items():
+            signature = len(room.members)
+            if self._room_signatures.get(rid) != signature:
+                self._room_signatures[rid] = signature
+                rooms.append(room.to_dict())
+        if rooms:
+            delta["rooms"] = rooms
+
+        memory = {}
+        for name, agent in sim.agents.items():
+            cursor = self._memory_cursors.get(name, 0)
+            if len(agent.memory) > cursor:
+                memory[name] = agent.memory[cursor:]
+                self._memory_cursors[name] = len(agent.memory)
+        if memory:
+            delta["memory"] = memory
+
+        graph = sim.relationships.take_changes()
+        if graph:
+            delta["graph"] = graph
+
+        state = self._state_changes()
+        if state:
+            delta["state"] = state
+        if len(delta) > 1:
+            _send(self.writer, delta)
+
+    def _state_changes(self):
+        """与上次推送相比变化的状态字段, agents 只包含状态变了的AI
+
+        聊天室列表和最近事件由镜像根据 rooms/event 推送自己生成, 资源计划在 hello 里发一次。
+        """
+        sim = self.sim
+        state = {
+            "day": sim.current_day,
+            "tick": sim.current_tick,
+            "running": sim.running,
+            "paused": sim.paused
+        }
+        changes = {k: v for k, v in state.items() if self._last_state.get(k) != v}
+        self._last_state.update(changes)
+
+        last_agents = self._last_state["agents"]
+        agents = {}
+        for name, agent in sim.agents.items():
+            status = agent.get_status()
+            if last_agents.get(name) != status:
+                agents[name] = last_agents[name] = status
+        if agents:
+            changes["agents"] = agents
+        return changes
+
+    async def _read_commands(self, reader, sim_task):
+        """处理前端发来的控制指令"""
+        while True:
+            line = await reader.readline()
+            if not line:
+                sim_task.cancel()
+                return
+            frame = json.loads(line)
+            op = frame.get("op")
+            if op == "control":
+                self.sim.control(frame["action"])
+                self._flush()
+            elif op == "budget":
+                self.sim.llm.set_budget(frame["max_concurrency"], frame["requests_per_minute"])
+            elif op == "human_message":
+                msg = Message.from_dict(frame["message"])
+                self._injected.add(msg.id)
+                self.sim.chat.add_message(msg)
+            elif op == "stop":
+                sim_task.cancel()
+                return
+
+
+def run_worker(config, address):
+    """工作进程入口"""
+    asyncio.run(SimulationWorker(config, address).run())
+
+
+class RemoteSimulation:
+    """前端进程中的模拟代理 - 接口与Simulation一致, 数据来自工作进程推送的镜像
+
+    WebServer 不需要区分本地模拟还是远程模拟。
+    """
+
+    def __init__(self, config):
+        self.config = config
+        sim_cfg = config["simulation"]
+        self.total_days = sim_cfg["total_days"]
+        self.tick_interval = sim_cfg["tick_interval"]
+        self.ticks_per_day = sim_cfg["ticks_per_day"]
+
+        # 镜像数据
+        self.chat = ChatSystem()
+        self.relationships = RelationshipGraph()
+        self.agents: dict[str, AIAgent] = {}
+        self.search = None
+        if config.get("search", {}).get("enabled", True):
+            self.search = SearchIndex()
+            self.search.watch(self.chat, [])
+        self.state = {
+            "day": 0, "tick": 0, "total_days": self.total_days,
+            "running": False, "paused": False, "agents": {}, "resource_schedule": {}
+        }
+
+        self.current_day = 0
+        self.current_tick = 0
+        self.running = False
+        self.paused = False
+        self.bus = EventBus()
+        self.event_log = []
+
+        self.process = None
+        self.reader = None
+        self.writer = None
+        self._socket_dir = None
+
+    async def start(self):
+        """启动工作进程并接收推送, 工作进程退出后返回"""
+        connected = asyncio.get_running_loop().create_future()
+
+        async def on_connect(reader, writer):
+            if not connected.done():
+                connected.set_result((reader, writer))
+
+        self._socket_dir = tempfile.mkdtemp(prefix="cave_sim_")
+        address = os.path.join(self._socket_dir, f"{uuid.uuid4().hex[:8]}.sock")
+        server = await _start_server(on_connect, address)
+
+        self.running = True
+        try:
+            ctx = multiprocessing.get_context("spawn")
+            self.process = ctx.Process(target=run_worker, args=(self.config, address), daemon=True)
+            self.process.start()
+            connection = await self._wait_for_worker(connected)
+            if connection is None:
+                return
+            self.reader, self.writer = connection
+            # 启动到连上期间预算可能重新分配过
+            self._send_budget()
+            await self._read_frames()
+        except OSError as e:
+            print(f"❌ 工作进程启动失败: {e}")
+        finally:
+            self.running = False
+            server.close()
+            await self._shutdown_process()
+
+    async def _read_frames(self):
+        """应用工作进程的推送, 直到它断开连接"""
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            self._apply(json.loads(line))
+
+    async def _wait_for_worker(self, connected):
+        """等待工作进程连回来; 进程提前退出或超时则返回None"""
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while not connected.done():
+            if not self.process.is_alive():
+                print(f"❌ 工作进程启动失败 (退出码 {self.process.exitcode})")
+                return None
+            if time.monotonic() > deadline:
+                print(f"❌ 工作进程 {CONNECT_TIMEOUT} 秒内没有连接")
+                return None
+            await asyncio.wait({connected}, timeout=0.2)
+        return connected.result()
+
+    def _apply(self, frame):
+        """把工作进程的推送应用到镜像"""
+        op = frame["op"]
+        if op == "hello":
+            for info in frame["agents"]:
+                agent = AIAgent(info["name"], info["personality"], info["traits"],
+                                llm_client=None, relationship_graph=self.relationships)
+                self.agents[agent.name] = agent
+                if self.search:
+                    self.search.watch_agent(agent)
+            self.tick_interval = frame["tick_interval"]
+            self.state["resource_schedule"] = frame["resource_schedule"]
+        elif op == "delta":
+            if "state" in frame:
+                self._apply_state(frame["state"])
+            for room in frame.get("rooms", []):
+                self.chat.add_room(ChatRoom.from_dict(room))
+            for msg in frame.get("messages", []):
+                self.chat.add_message(Message.from_dict(msg))
+            for name, entries in frame.get("memory", {}).items():
+                agent = self.agents[name]
+                for entry in entries:
+                    agent.remember(entry, self.current_day)
+            if "graph" in frame:
+                self.relationships.apply_changes(frame["graph"])
+        elif op == "typing":
+            self.bus.publish(Typing(frame["data"]))
+        elif op == "event":
+            self.event_log.append(frame["event"])
+            self.bus.publish(SimEvent(**frame["event"]))
+
+    def _apply_state(self, changes):
+        """合并状态增量"""
+        agents = changes.pop("agents", {})
+        self.state.update(changes)
+        self.state["agents"].update(agents)
+        self.current_day = self.state["day"]
+        self.current_tick = self.state["tick"]
+        self.paused = self.state["paused"]
+        for name, status in agents.items():
+            agent = self.agents.get(name)
+            if agent:
+                agent.alive = status["alive"]
+                agent.cans = status["cans"]
+                agent.water = status["water"]
+                agent.days_survived = status["days_survived"]
+
+    def _command(self, frame):
+        if self.writer and not self.writer.is_closing():
+            _send(self.writer, frame)
+
+    async def _shutdown_process(self):
+        """先让工作进程自己收尾: 发送stop, 等它断开连接(期间的推送照常应用), 再等进程退出
+
+        超时才强制终止; join 会阻塞, 放到线程池里执行, 不卡住事件循环。
+        """
+        if self.reader and not self.reader.at_eof():
+            self._command({"op": "stop"})
+            try:
+                await asyncio.wait_for(self._read_frames(), STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"⚠️ 工作进程 {STOP_TIMEOUT} 秒内没有退出, 强制终止")
+            except (OSError, ValueError):
+                pass
+        if self.writer:
+            self.writer.close()
+        if self.process:
+            if self.reader is None and self.process.is_alive():
+                self.process.terminate()    # 没连上的工作进程没有需要收尾的数据
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.process.join, STOP_TIMEOUT)
+            if self.process.is_alive():
+                self.process.terminate()
+                await loop.run_in_executor(None, self.process.join, 1)
+        if self._socket_dir:
+            for name in os.listdir(self._socket_dir):
+                os.unlink(os.path.join(self._socket_dir, name))
+            os.rmdir(self._socket_dir)
+            self._socket_dir = None
+
+    def get_state(self):
+        """镜像的状态(聊天室和最近事件取自本地镜像)"""
+        return {
+            **self.state,
+            "rooms": {rid: r.to_dict() for rid, r in self.chat.rooms.items()},
+            "recent_events": self.event_log[-50:]
+        }
+
+    def set_llm_budget(self, max_concurrency, requests_per_minute):
+        """调整工作进程的LLM预算(还没启动时改配置, 已连上时立即下发)"""
+        self.config["llm"]["max_concurrency"] = max_concurrency
+        self.config["llm"]["requests_per_minute"] = requests_per_minute
+        self._send_budget()
+
+    def _send_budget(self):
+        llm_cfg = self.config["llm"]
+        self._command({"op": "budget", "max_concurrency": llm_cfg["max_concurrency"],
+                       "requests_per_minute": llm_cfg["requests_per_minute"]})
+
+    def stop(self):
+        """通知工作进程停止"""
+        self._command({"op": "stop"})
+
+    def control(self, action):
+        """先在镜像上生效(立即返回结果), 再转发给工作进程"""
+        from simulation import Simulation
+        result = Simulation.control(self, action)
+        self._command({"op": "control", "action": action})
+        return result
+
+    def human_send_message(self, room_id, content):
+        """在镜像中生成消息(拿到id), 再转发给工作进程"""
+        room = self.chat.rooms.get(room_id)
+        if not room or not room.human_joined:
+            return None
+        msg = self.chat.send_message(room_id, "human", content,
+                                     self.current_day, self.current_tick)
+        self._command({"op": "human_message", "message": msg.to_dict()})
+        return msg